@@ -3,6 +3,11 @@ Main AI Agent that orchestrates STT, LLM, and TTS
 Simple voice recognition → LLM → Text-to-Speech pipeline
 """
 import os
+import queue
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from stt_module import STTModule
 from tts_module import TTSModule
@@ -10,6 +15,53 @@ from llm_module import LLMModule
 from voice_recorder import VoiceRecorder
 from intent_analyzer import IntentAnalyzer
 
+# Sentence end for streamed TTS chunks (includes Hindi danda)
+_SENTENCE_END_RE = re.compile(r'[.?!।]\s*$')
+# Flush a chunk to TTS after this many streamed tokens even without punctuation
+_MAX_CHUNK_TOKENS = 80
+# Extensions treated as audio file input in interactive mode
+_AUDIO_EXTS = frozenset({'.wav', '.mp3', '.m4a', '.flac', '.ogg', '.wma'})
+
+# System prompts for intelligent responses
+_SYSTEM_PROMPTS = {
+    'hindi': 'आप एक बुद्धिमान और सहायक AI सहायक हैं। उपयोगकर्ता के प्रश्नों का स्पष्ट, संक्षिप्त और उपयोगी उत्तर दें। हमेशा सही और प्रासंगिक जानकारी प्रदान करें।',
+    'english': 'You are an intelligent and helpful AI assistant. Provide clear, concise, and useful responses to user questions. Always give accurate and relevant information.',
+    'urdu': 'آپ ایک ذہین اور مددگار AI معاون ہیں۔ صارف کے سوالات کا واضح، مختصر اور مفید جواب دیں۔ ہمیشہ درست اور متعلقہ معلومات فراہم کریں۔',
+    'telugu': 'మీరు ఒక తెలివైన మరియు సహాయక AI సహాయకుడు. వినియోగదారు ప్రశ్నలకు స్పష్టమైన, సంక్షిప్తమైన మరియు ఉపయోగకరమైన సమాధానాలు ఇవ్వండి. ఎల్లప్పుడూ ఖచ్చితమైన మరియు సంబంధిత సమాచారాన్ని అందించండి.'
+}
+
+# Spoken prefixes before the transcription / AI response
+_INPUT_PREFIXES = {
+    'hindi': "आपने कहा: ",
+    'telugu': "మీరు చెప్పారు: ",
+    'urdu': "آپ نے کہا: ",
+    'english': "You said: ",
+}
+_RESPONSE_PREFIXES = {
+    'hindi': "AI ने उत्तर दिया: ",
+    'telugu': "AI సమాధానం: ",
+    'urdu': "AI کا جواب: ",
+    'english': "AI replied: ",
+}
+
+
+def is_sentence_boundary(buffer, token_count=0):
+    """
+    Check whether the buffered LLM output is ready to be spoken
+    
+    Args:
+        buffer: Text accumulated since the last TTS chunk
+        token_count: Number of streamed tokens in the buffer
+    
+    Returns:
+        True if the buffer ends a sentence, ends a long enough clause, or hit the token cap
+    """
+    if _SENTENCE_END_RE.search(buffer):
+        return True
+    if buffer.rstrip().endswith(',') and len(buffer.split()) >= 4:
+        return True
+    return token_count >= _MAX_CHUNK_TOKENS
+
 
 class AIAgent:
     def __init__(self, language='hindi', llm_model='phi3', auto_detect_language=True):
@@ -32,7 +84,9 @@ class AIAgent:
         
         # Initialize modules
         print("Loading STT module with Whisper...")
-        self.stt = STTModule(use_whisper=True)
+        # Warmed up in the background by _warmup()
+        self.stt = STTModule(use_whisper=True, language=self.language, auto_detect=self.auto_detect_language,
+                             warmup=False)
         
         print("Loading TTS module...")
         self.tts = TTSModule(language=self.language)
@@ -41,11 +95,22 @@ class AIAgent:
         self.llm = LLMModule(model_name=llm_model)
         
         print("Loading Intent Analyzer module...")
-        self.intent_analyzer = IntentAnalyzer(llm_model=llm_model)
+        self.intent_analyzer = IntentAnalyzer(llm_module=self.llm)
         
         print("Initializing voice recorder...")
         self.recorder = VoiceRecorder()
         
+        # Background pool for LLM calls that can overlap (intent analysis vs. response)
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        
+        # Piper synthesis runs ahead of playback on this pool
+        self._tts_pool = ThreadPoolExecutor(max_workers=2)
+        
+        # Single TTS worker for the whole session; turns queue chunks into it
+        self._speech_queue = queue.Queue()
+        self._tts_thread = threading.Thread(target=self._tts_worker, args=(self._speech_queue,), daemon=True)
+        self._tts_thread.start()
+        
         # Create temp directory for audio files
         self.temp_dir = "temp_audio"
         os.makedirs(self.temp_dir, exist_ok=True)
@@ -54,13 +119,18 @@ class AIAgent:
         self.output_dir = "output_text"
         os.makedirs(self.output_dir, exist_ok=True)
         
-        # System prompts for intelligent responses
-        self.system_prompts = {
-            'hindi': 'आप एक बुद्धिमान और सहायक AI सहायक हैं। उपयोगकर्ता के प्रश्नों का स्पष्ट, संक्षिप्त और उपयोगी उत्तर दें। हमेशा सही और प्रासंगिक जानकारी प्रदान करें।',
-            'english': 'You are an intelligent and helpful AI assistant. Provide clear, concise, and useful responses to user questions. Always give accurate and relevant information.',
-            'urdu': 'آپ ایک ذہین اور مددگار AI معاون ہیں۔ صارف کے سوالات کا واضح، مختصر اور مفید جواب دیں۔ ہمیشہ درست اور متعلقہ معلومات فراہم کریں۔',
-            'telugu': 'మీరు ఒక తెలివైన మరియు సహాయక AI సహాయకుడు. వినియోగదారు ప్రశ్నలకు స్పష్టమైన, సంక్షిప్తమైన మరియు ఉపయోగకరమైన సమాధానాలు ఇవ్వండి. ఎల్లప్పుడూ ఖచ్చితమైన మరియు సంబంధిత సమాచారాన్ని అందించండి.'
-        }
+        # System prompts for intelligent responses (shared across instances)
+        self.system_prompts = _SYSTEM_PROMPTS
+        
+        # Pre-synthesize the fixed "You said" / "AI replied" prefixes once
+        # (other languages are synthesized on first use after a switch)
+        self._prefix_wavs = {}
+        for kind in ('input', 'response'):
+            self._prefix_clip(self.language, kind)
+        
+        # Warm up Whisper and the LLM connection in the background so the
+        # first turn doesn't pay the cold-start cost
+        threading.Thread(target=self._warmup, daemon=True).start()
         
         print("AI Agent initialized successfully!")
     
@@ -75,21 +145,31 @@ class AIAgent:
             Dictionary with transcription, response, and audio path
         """
         try:
-            # Step 1: Record or use provided audio
+            # Step 1 + 2: Record or use provided audio, then Speech-to-Text
+            # (language detection happens inside STT module if enabled)
             if audio_path is None:
                 input_audio_path = os.path.join(self.temp_dir, "input.wav")
                 print("\nRecording voice input... (speak now, stops after 5 seconds of silence)")
-                self.recorder.record_until_silence(output_path=input_audio_path)
+                
+                # Each phrase is transcribed as soon as the speaker pauses, while recording continues.
+                # Whisper's VAD filter handles silence, so of the file-based noise reduction only
+                # the spectral suppression is applied, per phrase
+                phrases = []
+                chunks = self.recorder.stream_chunks(output_path=input_audio_path)
+                try:
+                    for phrase in self.stt.transcribe_stream(
+                            chunks, preprocess=self.recorder.noise_reducer.reduce_noise_array):
+                        print(f"[STT] Heard: {phrase}")
+                        phrases.append(phrase)
+                finally:
+                    # Stops the microphone right away if STT failed part-way
+                    chunks.close()
+                transcription = " ".join(phrases).strip()
             else:
                 input_audio_path = audio_path
                 print(f"Using provided audio file: {audio_path}")
-            
-            # Step 2: Speech-to-Text (with automatic language detection if enabled)
-            # Note: Noise reduction is already applied during recording
-            print("Converting speech to text...")
-            
-            # Transcribe (language detection happens inside STT module if enabled)
-            transcription = self.stt.transcribe(input_audio_path)
+                print("Converting speech to text...")
+                transcription = self.stt.transcribe(input_audio_path)
             print(f"Transcribed: {transcription}")
             
             if not transcription or transcription.strip() == "":
@@ -107,55 +187,35 @@ class AIAgent:
                 print(f"Language automatically detected and set to: {self.language.upper()}")
             
             # Step 2.5: Analyze transcription (Summary, Keywords, Intent)
+            # Runs in the background while the LLM response streams (independent prompts)
             print("Analyzing transcription (Summary, Keywords, Intent)...")
-            analysis = self.intent_analyzer.analyze(transcription, language=self.language)
-            print(f"Summary: {analysis.get('summary', 'N/A')}")
-            print(f"Keywords: {', '.join(analysis.get('keywords', []))}")
-            print(f"Intent: {analysis.get('intent', 'N/A')}")
+            analysis_future = self._executor.submit(self.intent_analyzer.analyze, transcription, self.language)
             
-            # Step 3: LLM Processing
-            print("Processing with LLM...")
-            system_prompt = self.system_prompts.get(self.language, self.system_prompts['english'])
-            response = self.llm.generate(
-                prompt=transcription,
-                system_prompt=system_prompt,
-                max_tokens=256,  # Increased from 128 for clearer, complete responses
-                temperature=0.4  # Lower temperature for more focused, coherent responses
-            )
-            print(f"LLM Response: {response}")
-            
-            # Step 4: Text-to-Speech and Play
-            print("Converting to speech and playing...")
+            # Step 3 + 4: Stream LLM response into TTS
+            # A single TTS worker speaks queued chunks in order while the LLM keeps decoding
+            print("Processing with LLM and converting to speech...")
+            speech_queue = self._speech_queue
             
             # Speak the input transcription first
             print("Speaking input transcription...")
-            if self.language == 'hindi':
-                input_prefix = "आपने कहा: "
-            elif self.language == 'telugu':
-                input_prefix = "మీరు చెప్పారు: "
-            elif self.language == 'urdu':
-                input_prefix = "آپ نے کہا: "
-            else:  # english
-                input_prefix = "You said: "
+            self._queue_prefix(speech_queue, 'input')
+            self._queue_text(speech_queue, transcription)
             
-            self.tts.speak(input_prefix + transcription)
+            # Then speak the AI response as it streams in
+            self._queue_prefix(speech_queue, 'response')
             
-            # Add a small pause
-            import time
-            time.sleep(0.5)
-            
-            # Then speak the AI response
-            print("Speaking AI response...")
-            if self.language == 'hindi':
-                response_prefix = "AI ने उत्तर दिया: "
-            elif self.language == 'telugu':
-                response_prefix = "AI సమాధానం: "
-            elif self.language == 'urdu':
-                response_prefix = "AI کا جواب: "
-            else:  # english
-                response_prefix = "AI replied: "
+            system_prompt = self.system_prompts.get(self.language, self.system_prompts['english'])
+            try:
+                response = self._stream_response(transcription, system_prompt, speech_queue)
+            finally:
+                # Wait until everything queued for this turn has been spoken
+                speech_queue.join()
+            print(f"LLM Response: {response}")
             
-            self.tts.speak(response_prefix + response)
+            analysis = analysis_future.result()
+            print(f"Summary: {analysis.get('summary', 'N/A')}")
+            print(f"Keywords: {', '.join(analysis.get('keywords', []))}")
+            print(f"Intent: {analysis.get('intent', 'N/A')}")
             
             # Step 5: Save transcription, analysis, and response to text file
             text_file_path = self._save_to_text_file(input_audio_path, transcription, response, analysis)
@@ -178,6 +238,158 @@ class AIAgent:
                 'response': ''
             }
     
+    def _warmup(self):
+        """Run 1s of silence through Whisper and a 1-token LLM request with the system prompt"""
+        self.stt.warmup()
+        try:
+            # Also opens the pooled HTTPS connection shared with the intent analyzer.
+            # Sending the real system prompt lets a prefix-caching server keep it warm.
+            system_prompt = self.system_prompts.get(self.language, self.system_prompts['english'])
+            self.llm.generate(prompt='hi', system_prompt=system_prompt, max_tokens=1)
+        except Exception as e:
+            print(f"[WARNING] LLM warmup failed: {e}")
+    
+    def _get_prefixes(self, language):
+        """
+        Get the spoken prefixes for a language
+        
+        Returns:
+            Tuple of (input_prefix, response_prefix)
+        """
+        return (_INPUT_PREFIXES.get(language, _INPUT_PREFIXES['english']),
+                _RESPONSE_PREFIXES.get(language, _RESPONSE_PREFIXES['english']))
+    
+    def _prefix_clip(self, language, kind):
+        """
+        Get a pre-synthesized WAV for a spoken prefix, synthesizing it on first use
+        
+        Args:
+            language: Language of the prefix
+            kind: 'input' or 'response'
+        
+        Returns:
+            Path to the WAV file, or None if Piper isn't available for the language
+        """
+        key = (language, kind)
+        if key not in self._prefix_wavs:
+            input_prefix, response_prefix = self._get_prefixes(language)
+            text = input_prefix if kind == 'input' else response_prefix
+            wav_path = os.path.abspath(os.path.join(self.temp_dir, f"prefix_{language}_{kind}.wav"))
+            # Piper only: the other backends can't reliably save to file and
+            # synthesize() would speak the prefix aloud instead
+            self._prefix_wavs[key] = self.tts.synthesize_piper(text.strip(), wav_path)
+        return self._prefix_wavs[key]
+    
+    def _queue_prefix(self, speech_queue, kind):
+        """Queue the cached prefix clip, or the prefix text if no clip is available"""
+        clip = self._prefix_clip(self.language, kind)
+        if clip:
+            speech_queue.put(('wav', clip))
+        else:
+            input_prefix, response_prefix = self._get_prefixes(self.language)
+            self._queue_text(speech_queue, input_prefix if kind == 'input' else response_prefix)
+    
+    def _queue_text(self, speech_queue, text):
+        """
+        Queue text for the TTS worker
+        
+        With Piper, synthesis starts right away on the TTS pool, so chunk k+1 is
+        synthesized while chunk k is still playing; the worker plays the results in order.
+        """
+        if self.tts.piper_available and self.tts.piper_model_path:
+            wav_path = os.path.abspath(os.path.join(self.temp_dir, f"chunk_{uuid.uuid4().hex}.wav"))
+            future = self._tts_pool.submit(self.tts.synthesize_piper, text, wav_path)
+            speech_queue.put(('future', future, text))
+        else:
+            speech_queue.put(text)
+    
+    def _stream_response(self, transcription, system_prompt, speech_queue):
+        """
+        Stream the LLM response and queue each sentence for TTS as soon as it is complete
+        
+        Args:
+            transcription: User's transcribed text (LLM prompt)
+            system_prompt: System prompt for the current language
+            speech_queue: Queue consumed by the TTS worker
+        
+        Returns:
+            Full response text
+        """
+        parts = []
+        buffer = ""
+        token_count = 0
+        
+        try:
+            for token in self.llm.stream(
+                prompt=transcription,
+                system_prompt=system_prompt,
+                max_tokens=256,  # Increased from 128 for clearer, complete responses
+                temperature=0.4  # Lower temperature for more focused, coherent responses
+            ):
+                parts.append(token)
+                buffer += token
+                token_count += 1
+                
+                if is_sentence_boundary(buffer, token_count):
+                    if buffer.strip():
+                        self._queue_text(speech_queue, buffer.strip())
+                    buffer = ""
+                    token_count = 0
+        except Exception as e:
+            if parts:
+                print(f"[WARNING] LLM stream interrupted: {e}")
+            else:
+                # Nothing streamed yet - fall back to a blocking request
+                print(f"[WARNING] LLM streaming failed ({e}), using blocking request...")
+                response = self.llm.generate(
+                    prompt=transcription,
+                    system_prompt=system_prompt,
+                    max_tokens=256,
+                    temperature=0.4
+                )
+                self._queue_text(speech_queue, response)
+                return response
+        
+        # Speak whatever is left after the stream ends
+        if buffer.strip():
+            self._queue_text(speech_queue, buffer.strip())
+        
+        return ''.join(parts).strip()
+    
+    def _tts_worker(self, speech_queue):
+        """
+        Speak queued text chunks in order until a None sentinel is received
+        
+        Args:
+            speech_queue: Queue of text chunks, ('wav', path) clips, or
+                          ('future', synthesis future, text) items to speak
+        """
+        while True:
+            item = speech_queue.get()
+            if item is None:
+                speech_queue.task_done()
+                break
+            try:
+                if isinstance(item, str):
+                    self.tts.speak(item)
+                elif item[0] == 'wav':
+                    self.tts.play_wav(item[1])
+                else:
+                    # Synthesized on the TTS pool; speak directly if Piper failed
+                    wav_path = item[1].result()
+                    if wav_path:
+                        self.tts.play_wav(wav_path)
+                        try:
+                            os.remove(wav_path)
+                        except OSError:
+                            pass
+                    else:
+                        self.tts.speak(item[2])
+            except Exception as e:
+                print(f"[WARNING] TTS failed for chunk: {e}")
+            finally:
+                speech_queue.task_done()
+    
     def _save_to_text_file(self, audio_path, transcription, response, analysis=None):
         """
         Save transcription, analysis, and response to a text file named after the audio file
@@ -206,29 +418,35 @@ class AIAgent:
             text_file_path = os.path.join(self.output_dir, text_filename)
             
             # Prepare content
-            content = f"Audio File: {os.path.basename(audio_path)}\n"
-            content += f"Language: {self.language.upper()}\n"
-            content += f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            content += f"{'='*60}\n\n"
-            content += f"TRANSCRIPTION:\n{'-'*60}\n{transcription}\n\n"
+            parts = [
+                f"Audio File: {os.path.basename(audio_path)}\n",
+                f"Language: {self.language.upper()}\n",
+                f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+                f"{'='*60}\n\n",
+                f"TRANSCRIPTION:\n{'-'*60}\n{transcription}\n\n",
+            ]
             
             # Add analysis section if available
             if analysis:
-                content += f"ANALYSIS:\n{'-'*60}\n"
+                parts.append(f"ANALYSIS:\n{'-'*60}\n")
                 if analysis.get('summary'):
-                    content += f"SUMMARY: {analysis['summary']}\n"
+                    parts.append(f"SUMMARY: {analysis['summary']}\n")
                 if analysis.get('keywords'):
                     keywords_str = ', '.join(analysis['keywords'])
-                    content += f"KEYWORDS: {keywords_str}\n"
+                    parts.append(f"KEYWORDS: {keywords_str}\n")
                 if analysis.get('intent'):
-                    content += f"INTENT: {analysis['intent']}\n"
-                content += "\n"
+                    parts.append(f"INTENT: {analysis['intent']}\n")
+                parts.append("\n")
             
-            content += f"AI RESPONSE:\n{'-'*60}\n{response}\n"
+            parts.append(f"AI RESPONSE:\n{'-'*60}\n{response}\n")
+            data = ''.join(parts).encode('utf-8')
             
-            # Write to file
-            with open(text_file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            # Write to file in a single call
+            fd = os.open(text_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
             
             print(f"\n[SUCCESS] Text saved to: {text_file_path}")
             return text_file_path
@@ -332,28 +550,24 @@ class AIAgent:
                     audio_file_path = user_input[5:].strip()
                 elif user_input.lower() not in ['', 'mic', 'microphone']:
                     # Check if input looks like a file path (has extension or is a path)
-                    audio_extensions = ['.wav', '.mp3', '.m4a', '.flac', '.ogg', '.wma']
-                    if any(user_input.lower().endswith(ext) for ext in audio_extensions) or os.sep in user_input or ':' in user_input:
+                    if os.path.splitext(user_input)[1].lower() in _AUDIO_EXTS or os.sep in user_input or ':' in user_input:
                         audio_file_path = user_input
                 
                 if audio_file_path:
                     # Try to find the file
                     found_path = None
                     
-                    # Check if it's an absolute path
-                    if os.path.isabs(audio_file_path):
-                        if os.path.exists(audio_file_path):
-                            found_path = audio_file_path
-                    else:
-                        # Check relative to current directory
-                        if os.path.exists(audio_file_path):
-                            found_path = os.path.abspath(audio_file_path)
-                        # Check relative to project directory
-                        elif os.path.exists(os.path.join(os.getcwd(), audio_file_path)):
-                            found_path = os.path.abspath(os.path.join(os.getcwd(), audio_file_path))
-                        # Check in temp_audio directory
-                        elif os.path.exists(os.path.join(self.temp_dir, audio_file_path)):
-                            found_path = os.path.abspath(os.path.join(self.temp_dir, audio_file_path))
+                    # Check as given (absolute or relative to current directory), then in temp_audio
+                    candidates = [audio_file_path]
+                    if not os.path.isabs(audio_file_path):
+                        candidates.append(os.path.join(self.temp_dir, audio_file_path))
+                    for candidate in candidates:
+                        try:
+                            os.stat(candidate)
+                        except OSError:
+                            continue
+                        found_path = os.path.abspath(candidate)
+                        break
                     
                     if found_path:
                         print(f"Processing audio file: {found_path}")
@@ -402,6 +616,10 @@ class AIAgent:
     def cleanup(self):
         """Clean up resources"""
         print("\nCleaning up resources...")
+        self._executor.shutdown(wait=False)
+        self._speech_queue.put(None)
+        self._tts_thread.join(timeout=5)
+        self._tts_pool.shutdown(wait=False)
         self.recorder.cleanup()
         print("Cleanup complete!")
 
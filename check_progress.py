@@ -3,9 +3,95 @@ Check Processing Progress
 Shows how many rows have been processed and how many remain
 """
 
+import json
 import os
 from openpyxl import load_workbook
 
+# Try to import polars for fast Parquet-backed row counts
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+    pl = None
+
+
+def _parquet_path(excel_file):
+    """Parquet copy that sits beside an Excel file"""
+    return os.path.splitext(excel_file)[0] + '.parquet'
+
+
+def convert_xlsx_to_parquet(source_file, parquet_file=None):
+    """
+    Convert an Excel file to a zstd-compressed Parquet copy
+    
+    Args:
+        source_file: Excel file to convert
+        parquet_file: Output path (default: same name with .parquet)
+    
+    Returns:
+        Path to the Parquet file, or None if polars is not installed
+    """
+    if not POLARS_AVAILABLE:
+        print("⚠️  polars not installed. Install with: pip install polars fastexcel")
+        return None
+    
+    parquet_file = parquet_file or _parquet_path(source_file)
+    pl.read_excel(source_file).write_parquet(parquet_file, compression='zstd')
+    print(f"✓ Converted {source_file} -> {parquet_file}")
+    return parquet_file
+
+
+def pending_rows(excel_file):
+    """Rows journaled by a run whose workbook hasn't been written yet"""
+    journal = os.path.splitext(excel_file)[0] + '_pending.jsonl'
+    if not os.path.exists(journal):
+        return 0
+    with open(journal, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def read_checkpoint(excel_file):
+    """
+    Next source row recorded by TranscribeProcessor's checkpoint file
+    
+    Args:
+        excel_file: Output Excel file
+    
+    Returns:
+        Next source row number, or None if there is no checkpoint or the
+        Excel file was modified after it was written
+    """
+    checkpoint = os.path.splitext(excel_file)[0] + '_checkpoint.json'
+    if not os.path.exists(checkpoint):
+        return None
+    if os.path.exists(excel_file) and os.path.getmtime(excel_file) > os.path.getmtime(checkpoint):
+        return None
+    try:
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            return int(json.load(f)['next_source_row'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def count_rows(excel_file):
+    """
+    Count data rows (excluding header)
+    
+    Uses an up-to-date Parquet copy when available (only the footer is read),
+    otherwise falls back to openpyxl.
+    """
+    parquet_file = _parquet_path(excel_file)
+    if (POLARS_AVAILABLE and os.path.exists(parquet_file)
+            and os.path.getmtime(parquet_file) >= os.path.getmtime(excel_file)):
+        return pl.scan_parquet(parquet_file).select(pl.len()).collect().item()
+    
+    wb = load_workbook(excel_file, read_only=True)
+    ws = wb.active
+    rows = ws.max_row - 1  # Exclude header
+    wb.close()
+    return rows
+
 
 def check_progress(source_file='Transcript-24-11-2025.xlsx', output_file='IntentOfthetranscribetext.xlsx'):
     """Check processing progress"""
@@ -19,16 +105,14 @@ def check_progress(source_file='Transcript-24-11-2025.xlsx', output_file='Intent
         print(f"❌ Source file not found: {source_file}")
         return
     
-    wb_source = load_workbook(source_file, read_only=True)
-    ws_source = wb_source.active
-    total_rows = ws_source.max_row - 1  # Exclude header
-    wb_source.close()
+    total_rows = count_rows(source_file)
     
     print(f"\n📖 Source File: {source_file}")
     print(f"   Total rows: {total_rows}")
     
-    # Check output file
-    if not os.path.exists(output_file):
+    # Check output file (rows of a run still in progress are in its journal)
+    pending = pending_rows(output_file)
+    if not os.path.exists(output_file) and not pending:
         print(f"\n💾 Output File: {output_file}")
         print(f"   Status: Not created yet")
         print(f"   Processed: 0 rows")
@@ -36,10 +120,7 @@ def check_progress(source_file='Transcript-24-11-2025.xlsx', output_file='Intent
         print(f"\n📊 Progress: 0%")
         return
     
-    wb_output = load_workbook(output_file, read_only=True)
-    ws_output = wb_output.active
-    processed_rows = ws_output.max_row - 1  # Exclude header
-    wb_output.close()
+    processed_rows = (count_rows(output_file) if os.path.exists(output_file) else 0) + pending
     
     remaining = total_rows - processed_rows
     progress_pct = (processed_rows / total_rows * 100) if total_rows > 0 else 0
@@ -85,7 +166,14 @@ def check_progress(source_file='Transcript-24-11-2025.xlsx', output_file='Intent
 if __name__ == "__main__":
     import sys
     
-    source_file = sys.argv[1] if len(sys.argv) > 1 else 'Transcript-24-11-2025.xlsx'
-    output_file = sys.argv[2] if len(sys.argv) > 2 else 'IntentOfthetranscribetext.xlsx'
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    source_file = args[0] if len(args) > 0 else 'Transcript-24-11-2025.xlsx'
+    output_file = args[1] if len(args) > 1 else 'IntentOfthetranscribetext.xlsx'
+    
+    # --to-parquet: refresh Parquet copies so later checks only read the footer
+    if '--to-parquet' in sys.argv:
+        for excel_file in (source_file, output_file):
+            if os.path.exists(excel_file):
+                convert_xlsx_to_parquet(excel_file)
     
     check_progress(source_file, output_file)
@@ -8,19 +8,84 @@ Analyzes transcribed text to extract:
 
 from llm_module import LLMModule
 import json
+import os
+import pickle
 import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+# Optional sentence-transformers for the semantic (near-duplicate) cache.
+# Imported on first use: it pulls in torch, which the exact cache doesn't need.
+SENTENCE_TRANSFORMERS_AVAILABLE = find_spec('sentence_transformers') is not None
+
+# Multilingual encoder: the English-only all-MiniLM-L6-v2 tokenizer strips
+# Devanagari/Telugu combining marks, so different Hindi/Telugu transcripts
+# embedded almost identically and shared each other's cached intents
+_EMBED_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# Bumped when _normalize changes; exact-cache keys saved by another version are dropped
+_NORMALIZE_VERSION = 2
+
+# Try to import orjson for faster JSON parsing of intent responses
+try:
+    import orjson
+    _json_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _json_loads = json.loads
+    ORJSON_AVAILABLE = False
+
+# Patterns used by IntentAnalyzer._parse_response (compiled once)
+_PREFIX_RE = re.compile(r'^(intent|intent:|the intent is|user intent|intent is)[:\s]*', re.IGNORECASE)
+_TRAIL_PUNCT_RE = re.compile(r'[.,;:!?]+$')
+_WORD_CLEAN_RE = re.compile(r'[^\w\s-]')
+# "intent": "<value>" anywhere in the reply (code fences, trailing text, cut-off JSON)
+_INTENT_FIELD_RE = re.compile(r'"intent"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# English system prompt for intent (always in English, 2-3 words).
+# Kept constant so every request sends an identical prefix.
+_INTENT_SYSTEM_PROMPT = """You are an intent classifier. Your task is to identify the user's intent from the given text and provide it in exactly 2-3 words in English. 
+Examples of correct intents:
+- "power cut" (for power/electricity issues)
+- "complaint" (for complaints)
+- "bill inquiry" (for bill questions)
+- "connection request" (for new connections)
+- "payment issue" (for payment problems)
+- "service request" (for service requests)
+
+Reply ONLY with JSON in the form {"intent": "<2-3 words>"}, nothing else."""
 
 
 class IntentAnalyzer:
-    def __init__(self, llm_model='sarvam-m', api_key=None):
+    def __init__(self, llm_model='sarvam-m', api_key=None, cache_path=None, semantic_threshold=0.92, llm_module=None, session=None):
         """
         Initialize Intent Analyzer
         
         Args:
             llm_model: Sarvam AI model name (default: 'sarvam-m' - multilingual model)
             api_key: Sarvam AI API key (if None, reads from SARVAM_API_KEY env var)
+            cache_path: Pickle file to load/save the intent cache (optional)
+            semantic_threshold: Cosine similarity for a near-duplicate cache hit (default: 0.92)
+            llm_module: Existing LLMModule to share (llm_model/api_key/session are then ignored)
+            session: requests.Session for a new LLMModule (default: shared module session)
         """
-        self.llm = LLMModule(model_name=llm_model, api_key=api_key)
+        self.llm = llm_module if llm_module is not None else LLMModule(model_name=llm_model, api_key=api_key, session=session)
+        
+        # Intent cache: exact match on normalized text, then semantic match on
+        # multilingual MiniLM sentence embeddings (only if sentence-transformers is installed)
+        self.cache_path = cache_path
+        self.semantic_threshold = semantic_threshold
+        self._exact = {}
+        self._emb_vecs = []
+        self._emb_intents = []
+        self._encoder = None
+        # Embeddings of recent lookup misses, reused when the intent is stored
+        # so each new text is only embedded once
+        self._query_vecs = {}
+        self._cache_lock = threading.Lock()
+        self._load_cache()
         
         # System prompts for analysis in different languages (focus on intent only - short and specific)
         self.analysis_prompts = {
@@ -54,46 +119,216 @@ INTENT: కేవలం 2-3 పదాలలో ఉద్దేశాన్ని
             language: Language of the text ('hindi', 'english', 'urdu', 'telugu')
         
         Returns:
-            Dictionary with 'intent'
+            Dictionary with 'intent' ('unknown' plus 'error': True if the LLM call failed)
         """
         if not text or not text.strip():
             return {
                 'intent': ''
             }
         
-        # Use English system prompt for intent (always in English, 2-3 words)
-        system_prompt = """You are an intent classifier. Your task is to identify the user's intent from the given text and provide it in exactly 2-3 words in English. 
-Examples of correct intents:
-- "power cut" (for power/electricity issues)
-- "complaint" (for complaints)
-- "bill inquiry" (for bill questions)
-- "connection request" (for new connections)
-- "payment issue" (for payment problems)
-- "service request" (for service requests)
-
-Provide ONLY the intent in 2-3 words, nothing else."""
+        # Check cache first (exact, then semantic)
+        key = self._normalize(text)
+        cached = self._cache_lookup(key, text)
+        if cached is not None:
+            return {
+                'intent': cached
+            }
         
         # Create analysis prompt (intent should be short, 2-3 words in English)
-        analysis_prompt = f"Identify the user's intent from this text. Provide ONLY 2-3 words in English.\n\nText: {text}\n\nIntent (2-3 words only):"
+        analysis_prompt = f"Identify the user's intent from this text.\n\nText: {text}\n\nJSON:"
         
         try:
             # Get LLM response
             response = self.llm.generate(
                 prompt=analysis_prompt,
-                system_prompt=system_prompt,
-                max_tokens=20,  # Very short - only need 2-3 words
+                system_prompt=_INTENT_SYSTEM_PROMPT,
+                max_tokens=30,  # Very short - only need {"intent": "2-3 words"}
                 temperature=0.2  # Very low temperature for consistent output
             )
             
+            # LLMModule returns error text instead of raising (429, timeout, ...);
+            # 'error' tells callers not to persist this result either
+            if response.startswith('Error'):
+                return {
+                    'intent': 'unknown',
+                    'error': True
+                }
+            
             # Parse the response
             parsed_result = self._parse_response(response)
+            
+            # Don't cache replies nothing could be parsed from
+            if parsed_result['intent'] != 'unknown':
+                self._cache_store(key, text, parsed_result['intent'])
             return parsed_result
             
         except Exception as e:
             print(f"[ERROR] Intent analysis failed: {e}")
             return {
-                'intent': 'unknown'
+                'intent': 'unknown',
+                'error': True
+            }
+    
+    def analyze_batch(self, texts, language='english', concurrency=16):
+        """
+        Analyze many texts concurrently (API calls are I/O-bound)
+        
+        Duplicate texts are only sent once; the cache serves the rest.
+        
+        Args:
+            texts: List of transcribed texts
+            language: Language of the texts
+            concurrency: Maximum number of in-flight LLM requests (default: 16)
+        
+        Returns:
+            List of result dictionaries (same order as texts)
+        """
+        if not texts:
+            return []
+        
+        # Analyze each distinct normalized text once, then fan results back out
+        unique = {}
+        for text in texts:
+            if text and text.strip():
+                unique.setdefault(self._normalize(text), text)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique) or 1))) as executor:
+            results = dict(zip(unique, executor.map(lambda t: self.analyze(t, language=language), unique.values())))
+        
+        return [
+            results.get(self._normalize(text), {'intent': ''}) if text and text.strip() else {'intent': ''}
+            for text in texts
+        ]
+    
+    def lookup(self, text):
+        """
+        Return the cached intent for text without calling the LLM
+        
+        Args:
+            text: Transcribed text
+        
+        Returns:
+            Cached intent string, or None on miss
+        """
+        if not text or not text.strip():
+            return None
+        return self._cache_lookup(self._normalize(text), text)
+    
+    def remember(self, text, intent):
+        """
+        Cache an intent that was obtained elsewhere (e.g. a fused summary+intent call)
+        
+        Args:
+            text: Transcribed text
+            intent: Intent string to cache
+        """
+        if text and text.strip():
+            self._cache_store(self._normalize(text), text, intent)
+    
+    def _normalize(self, text):
+        """
+        Normalize text for exact-match caching (lowercase, no punctuation, single spaces)
+        
+        Only Unicode punctuation (P*) and symbols (S*) are dropped. A [^\w\s]
+        pattern would also strip combining marks (Mn/Mc), i.e. Devanagari and
+        Telugu vowel signs, so different transcripts shared one key.
+        """
+        text = ''.join(ch for ch in text.lower() if unicodedata.category(ch)[0] not in 'PS')
+        return ' '.join(text.split())
+    
+    def _embed(self, text):
+        """Return a unit-length MiniLM embedding, or None if semantic cache is unavailable"""
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            return None
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+            self._encoder = SentenceTransformer(_EMBED_MODEL)
+        return self._encoder.encode(text, normalize_embeddings=True)
+    
+    def _cache_lookup(self, key, text):
+        """
+        Look up a cached intent
+        
+        Args:
+            key: Normalized text
+            text: Original text (for the semantic lookup)
+        
+        Returns:
+            Cached intent string, or None on miss
+        """
+        with self._cache_lock:
+            if key in self._exact:
+                return self._exact[key]
+            if not self._emb_vecs:
+                return None
+            import numpy as np
+            vecs = np.stack(self._emb_vecs)
+            intents = list(self._emb_intents)
+        
+        query = self._embed(text)
+        if query is None:
+            return None
+        with self._cache_lock:
+            self._query_vecs[key] = query
+            if len(self._query_vecs) > 256:
+                # Misses that never got stored (e.g. LLM errors); drop the oldest
+                self._query_vecs.pop(next(iter(self._query_vecs)))
+        
+        sims = vecs @ query
+        best = int(np.argmax(sims))
+        if sims[best] >= self.semantic_threshold:
+            return intents[best]
+        return None
+    
+    def _cache_store(self, key, text, intent):
+        """Store an intent in the exact and semantic caches"""
+        with self._cache_lock:
+            vec = self._query_vecs.pop(key, None)
+        if vec is None:
+            vec = self._embed(text)
+        with self._cache_lock:
+            self._exact[key] = intent
+            if vec is not None:
+                self._emb_vecs.append(vec)
+                self._emb_intents.append(intent)
+    
+    def _load_cache(self):
+        """Load a previously saved cache from cache_path (if any)"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+            # Keys from an older _normalize can collide; only the embeddings are reused
+            if data.get('normalize_version') == _NORMALIZE_VERSION:
+                self._exact = data.get('exact', {})
+            # Embeddings from another model live in a different vector space
+            if SENTENCE_TRANSFORMERS_AVAILABLE and data.get('emb_model') == _EMBED_MODEL:
+                self._emb_vecs = list(data.get('emb_vecs', []))
+                self._emb_intents = list(data.get('emb_intents', []))
+            print(f"Loaded intent cache: {len(self._exact)} entries from {self.cache_path}")
+        except Exception as e:
+            print(f"[WARNING] Could not load intent cache: {e}")
+    
+    def save_cache(self):
+        """Save the cache to cache_path so later runs start warm"""
+        if not self.cache_path:
+            return
+        with self._cache_lock:
+            data = {
+                'exact': dict(self._exact),
+                'normalize_version': _NORMALIZE_VERSION,
+                'emb_model': _EMBED_MODEL,
+                'emb_vecs': list(self._emb_vecs),
+                'emb_intents': list(self._emb_intents)
             }
+        try:
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[WARNING] Could not save intent cache: {e}")
     
     def _parse_response(self, response):
         """
@@ -112,30 +347,30 @@ Provide ONLY the intent in 2-3 words, nothing else."""
         if not response:
             return result
         
-        # Clean the response
-        response = response.strip()
-        
-        # Remove common prefixes
-        response = re.sub(r'^(intent|intent:|the intent is|user intent|intent is)[:\s]*', '', response, flags=re.IGNORECASE)
-        response = response.strip()
-        
-        # Remove quotes
-        response = response.strip('"\'')
-        
-        # Remove any trailing punctuation
-        response = re.sub(r'[.,;:!?]+$', '', response)
+        # Structured output: {"intent": "power cut"}, also inside ```json fences,
+        # followed by extra text, or with the closing brace cut off by max_tokens
+        match = _INTENT_FIELD_RE.search(response)
+        if match:
+            try:
+                value = _json_loads('"' + match.group(1) + '"')
+            except ValueError:
+                value = match.group(1)
+            words = str(value).lower().split()[:3]
+            result['intent'] = ' '.join(words) if words else 'unknown'
+            return result
+        if '"intent"' in response:
+            # JSON whose value was cut off: the free-text cleanup below would
+            # turn the keys and braces into words like "json intent power"
+            result['intent'] = 'unknown'
+            return result
         
-        # Split into words and clean each word
-        words = []
-        for word in response.split():
-            # Remove special characters but keep hyphens (for "power-cut" -> "power cut")
-            word = re.sub(r'[^\w-]', '', word)
-            if word and len(word) > 0:
-                words.append(word.lower())
+        # Clean the response: drop prefixes, quotes and trailing punctuation
+        response = _PREFIX_RE.sub('', response.strip()).strip()
+        response = _TRAIL_PUNCT_RE.sub('', response.strip('"\''))
         
-        # Take only first 2-3 words
-        if len(words) > 3:
-            words = words[:3]
+        # Remove special characters but keep hyphens (for "power-cut" -> "power cut"),
+        # then take only the first 2-3 words
+        words = _WORD_CLEAN_RE.sub('', response).lower().split()[:3]
         
         result['intent'] = ' '.join(words) if words else 'unknown'
         
@@ -3,21 +3,91 @@ Language Detection Module for Speech Recognition
 Automatically detects language from audio (Hindi, English, Urdu, Telugu)
 Works offline after initial model download
 Uses only public models - No tokens required
+
+torch, librosa, transformers and the optional backends are imported on first use,
+so importing this module stays cheap.
 """
-import torch
 import numpy as np
-import librosa
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 import os
+import threading
+from importlib.util import find_spec
+from math import gcd
+from types import SimpleNamespace
+
+# Optional SpeechBrain for the fast VoxLingua107 language-ID pre-check
+SPEECHBRAIN_AVAILABLE = find_spec('speechbrain') is not None
+
+# Loaded (processor, model) pairs keyed by (model_name, device, precision, backend),
+# shared by all detectors
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+# Unicode script range per language (text is lowercased, so English is a-z)
+SCRIPT_RANGES = {
+    'hindi': (0x0900, 0x097F),   # Devanagari
+    'urdu': (0x0600, 0x06FF),    # Arabic
+    'telugu': (0x0C00, 0x0C7F),  # Telugu
+    'english': (0x61, 0x7A),     # Latin a-z
+}
+
+# Optional ONNX Runtime for the ONNX backend
+ONNXRUNTIME_AVAILABLE = find_spec('onnxruntime') is not None
+
+# VoxLingua107 ISO codes for the supported languages
+LANGID_CODES = {
+    'hi': 'hindi',
+    'en': 'english',
+    'ur': 'urdu',
+    'te': 'telugu',
+}
+
+
+class _OnnxWav2Vec2:
+    """ONNX Runtime session behind the same call interface as Wav2Vec2ForCTC"""
+    
+    def __init__(self, session):
+        self.session = session
+    
+    def __call__(self, input_values, **kwargs):
+        import torch
+        logits = self.session.run(['logits'], {'input_values': input_values.cpu().numpy()})[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
 
 
 class LanguageDetector:
-    def __init__(self):
+    def __init__(self, precision='auto', langid_threshold=0.8, preload=True, max_seconds=5, backend='torch'):
         """
         Initialize Language Detector
         Uses only public models - no authentication required
+        
+        Args:
+            precision: 'fp16' (CUDA only), 'int8' (dynamic quantization, CPU only), 'fp32',
+                       or 'auto' (fp16 on CUDA, int8 on CPU)
+            langid_threshold: Minimum VoxLingua107 probability to trust the fast pre-check
+                              (only used if SpeechBrain is installed; None disables it)
+            preload: Start loading the Wav2Vec2 model in the background right away
+            max_seconds: Only the first max_seconds of audio are used for detection
+                         (None uses the whole clip)
+            backend: 'torch' or 'onnx' (exported once to ONNX and run with ONNX Runtime;
+                     needs onnxruntime; 'int8' uses a dynamically quantized copy of the
+                     export, anything else runs in fp32)
         """
+        import torch
+        
+        self.max_seconds = max_seconds
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        if backend == 'onnx' and not ONNXRUNTIME_AVAILABLE:
+            print("Language detector: onnxruntime not installed, using PyTorch backend")
+            backend = 'torch'
+        self.backend = backend
+        if backend == 'onnx':
+            if precision == 'auto':
+                precision = 'int8' if self.device == 'cpu' else 'fp32'
+            elif precision != 'int8':
+                precision = 'fp32'
+        elif precision == 'auto':
+            precision = 'fp16' if self.device == 'cuda' else 'int8'
+        self.precision = precision
         
         # Use only public model for all languages (no token required)
         # facebook/wav2vec2-base-960h is public and works for all languages
@@ -26,111 +96,326 @@ class LanguageDetector:
         # Cache for loaded model
         self.processor = None
         self.model = None
+        self._vocab = None  # id -> token array for _ctc_decode
+        
+        # Small ECAPA language-ID model, loaded on first use
+        self.langid_threshold = langid_threshold
+        self._langid = None
+        
+        # Load the model in the background; _load_model() waits on the cache lock,
+        # so the first detection overlaps audio loading with the tail of model loading
+        if preload:
+            threading.Thread(target=self._preload, daemon=True).start()
         
         print("Language Detector initialized (using public models)")
     
     def _load_model(self):
-        """Load STT model - public model, no token required"""
+        """Load STT model - public model, no token required (shared across instances)"""
         if self.processor is not None and self.model is not None:
             return self.processor, self.model
         
+        key = (self.model_name, self.device, self.precision, self.backend)
+        with _MODEL_CACHE_LOCK:
+            if key not in _MODEL_CACHE:
+                _MODEL_CACHE[key] = self._build_model()
+        
+        self.processor, self.model = _MODEL_CACHE[key]
+        return self.processor, self.model
+    
+    def _preload(self):
+        """Background model load (errors resurface on the first real detection)"""
+        try:
+            self._load_model()
+        except Exception as e:
+            print(f"Language detector: background model load failed: {e}")
+    
+    def _build_model(self):
+        """Load processor and model from the Hugging Face cache (downloading once if needed)"""
+        import torch
+        from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
+        
         try:
             # Try offline first (local_files_only=True)
             try:
-                self.processor = Wav2Vec2Processor.from_pretrained(
+                processor = Wav2Vec2Processor.from_pretrained(
                     self.model_name, local_files_only=True
                 )
-                self.model = Wav2Vec2ForCTC.from_pretrained(
+                model = Wav2Vec2ForCTC.from_pretrained(
                     self.model_name, local_files_only=True
                 )
             except:
                 # Download if not in cache (first time only - requires internet)
                 print(f"Language detector: Downloading {self.model_name} (one time only, requires internet)...")
-                self.processor = Wav2Vec2Processor.from_pretrained(
+                processor = Wav2Vec2Processor.from_pretrained(
                     self.model_name, local_files_only=False
                 )
-                self.model = Wav2Vec2ForCTC.from_pretrained(
+                model = Wav2Vec2ForCTC.from_pretrained(
                     self.model_name, local_files_only=False
                 )
                 print(f"Model downloaded. Future runs will be OFFLINE.")
             
-            self.model.to(self.device)
-            self.model.eval()
+            model.eval()
+            if self.backend == 'onnx':
+                return processor, self._build_onnx_model(model)
             
-            return self.processor, self.model
+            model.to(self.device)
+            
+            if self.device == 'cuda':
+                # Clips cut to max_seconds mostly share one shape, so cuDNN's
+                # per-shape algorithm search pays off; TF32 matmuls for fp32 on Ampere+
+                torch.backends.cudnn.benchmark = True
+                torch.set_float32_matmul_precision('high')
+            
+            # Lower precision: FP16 weights on GPU, int8 Linear layers on CPU
+            if self.precision == 'fp16' and self.device == 'cuda':
+                model = model.half()
+            elif self.precision == 'int8' and self.device == 'cpu':
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            
+            return processor, self._compile_model(processor, model)
         except Exception as e:
             raise RuntimeError(f"Failed to load model: {e}")
     
+    def _build_onnx_model(self, model):
+        """Export the model to ONNX once and load it into an ONNX Runtime session"""
+        import torch
+        import onnxruntime as ort
+        
+        onnx_path = os.path.join("pretrained_models", self.model_name.replace('/', '_') + ".onnx")
+        if not os.path.exists(onnx_path):
+            print(f"Language detector: Exporting {self.model_name} to ONNX (one time only)...")
+            os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+            torch.onnx.export(
+                model,
+                (torch.zeros(1, 16000),),
+                onnx_path,
+                opset_version=17,
+                input_names=['input_values'],
+                output_names=['logits'],
+                dynamic_axes={'input_values': {0: 'batch', 1: 'samples'},
+                              'logits': {0: 'batch', 1: 'frames'}},
+            )
+        
+        if self.precision == 'int8':
+            # INT8 MatMul weights (dynamic quantization): smaller and faster on CPU
+            int8_path = onnx_path.replace('.onnx', '.int8.onnx')
+            if not os.path.exists(int8_path):
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                print("Language detector: Quantizing ONNX model to INT8 (one time only)...")
+                quantize_dynamic(onnx_path, int8_path, op_types_to_quantize=['MatMul'],
+                                 weight_type=QuantType.QInt8)
+            onnx_path = int8_path
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+                     if p in ort.get_available_providers()]
+        return _OnnxWav2Vec2(ort.InferenceSession(onnx_path, sess_options=options, providers=providers))
+    
+    def _compile_model(self, processor, model):
+        """
+        Compile the model with torch.compile (if available) and warm it up
+        
+        Compilation happens lazily on the first forward, so two dummy forwards run
+        here; if either fails, the eager model is used instead.
+        """
+        import torch
+        
+        if not hasattr(torch, 'compile'):
+            return model
+        
+        try:
+            # Audio length varies per clip, so compile for dynamic shapes. On CUDA,
+            # "reduce-overhead" also captures CUDA graphs, replaying each forward
+            # as one launch; clips cut to max_seconds all share a shape, so one
+            # captured graph serves most calls
+            mode = "reduce-overhead" if self.device == 'cuda' else "default"
+            compiled = torch.compile(model, dynamic=True, mode=mode)
+            dummy = processor(np.zeros(16000, dtype=np.float32), sampling_rate=16000, return_tensors="pt")
+            dummy = self._to_device(dummy)
+            with torch.inference_mode():
+                for _ in range(2):
+                    compiled(**dummy)
+            return compiled
+        except Exception as e:
+            print(f"Language detector: torch.compile unavailable ({e}), using eager model")
+            return model
+    
+    def _to_device(self, inputs):
+        """Move processor outputs to the model device (and to FP16 for an FP16 model)"""
+        if self.device != 'cuda':
+            return dict(inputs)
+        
+        # Pinned host memory lets the copy to the GPU run asynchronously
+        half = self.precision == 'fp16'
+        return {k: (v.half() if half and v.is_floating_point() else v).pin_memory().to(self.device, non_blocking=True)
+                for k, v in inputs.items()}
+    
+    @staticmethod
+    def clear_model_cache():
+        """Drop all cached models (e.g. to free GPU memory)"""
+        with _MODEL_CACHE_LOCK:
+            _MODEL_CACHE.clear()
+    
     def preprocess_audio(self, audio_path, target_sr=16000):
         """Preprocess audio file"""
-        audio, sr = librosa.load(audio_path, sr=target_sr)
-        audio = audio / np.max(np.abs(audio))
+        try:
+            import soundfile as sf
+            from scipy.signal import resample_poly
+            
+            # libsndfile reads WAV/FLAC/OGG directly, much faster than librosa.load
+            audio, sr = sf.read(audio_path, dtype='float32', always_2d=False)
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1, dtype=np.float32)
+            if sr != target_sr:
+                g = gcd(sr, target_sr)
+                audio = resample_poly(audio, target_sr // g, sr // g).astype(np.float32)
+        except Exception:
+            # Formats libsndfile can't decode (e.g. MP3/M4A on older builds)
+            import librosa
+            audio, sr = librosa.load(audio_path, sr=target_sr)
+        
+        # Normalize in place (guard against silent audio)
+        np.divide(audio, np.abs(audio).max() + 1e-12, out=audio)
+        return audio
+    
+    def _load_clip(self, audio_path):
+        """Preprocess audio and keep only the window used for detection"""
+        audio = self.preprocess_audio(audio_path)
+        if self.max_seconds:
+            # The first few seconds are enough to tell the language apart, and the
+            # model cost grows (super)linearly with length
+            audio = audio[:int(16000 * self.max_seconds)]
         return audio
     
     def _transcribe_with_language(self, audio_array, language):
-        """Transcribe audio with the model (same model for all languages)"""
+        """Transcribe audio with the model (same model for all languages, so `language` is unused)"""
+        return self._transcribe(audio_array)
+    
+    def _transcribe(self, audio_array):
+        """Run a single Wav2Vec2 forward pass and greedy-decode it"""
+        import torch
+        
         try:
             processor, model = self._load_model()
             
             inputs = processor(audio_array, sampling_rate=16000, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            inputs = self._to_device(inputs)
             
-            with torch.no_grad():
+            with torch.inference_mode():
                 logits = model(**inputs).logits
             
             predicted_ids = torch.argmax(logits, dim=-1)
-            transcription = processor.decode(predicted_ids[0])
-            
-            return transcription
+            return self._ctc_decode(processor, predicted_ids[0].cpu().numpy())
         except Exception as e:
             return ""
     
-    def _calculate_confidence(self, transcription, language):
+    def _ctc_decode(self, processor, ids):
         """
-        Calculate confidence score for transcription
+        Greedy CTC collapse (same output as processor.decode for this model)
+        
+        Merges repeated ids, drops padding (the CTC blank) and maps the word
+        delimiter to spaces, using a vocab array built once per detector.
+        """
+        tokenizer = processor.tokenizer
+        if self._vocab is None:
+            self._vocab = np.array(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer)))), dtype=object)
+        
+        if len(ids) == 0:
+            return ""
+        keep = np.concatenate(([True], ids[1:] != ids[:-1]))
+        ids = ids[keep]
+        ids = ids[ids != tokenizer.pad_token_id]
+        
+        text = ''.join(self._vocab[ids]).replace(tokenizer.word_delimiter_token, ' ')
+        return ' '.join(text.split())
+    
+    def _text_features(self, transcription):
+        """
+        Language-independent features of a transcription, computed once per detection
+        
+        Returns:
+            Dictionary with normalized 'text', its 'len', 'words' count and 'cp'
+            (uint32 code point array)
+        """
+        text = transcription.strip().lower() if transcription else ""
+        return {
+            'text': text,
+            'len': len(text),
+            'words': len(text.split()),
+            'cp': np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32),
+        }
+    
+    def _score(self, features, language):
+        """
+        Confidence score for one language from precomputed text features
         Higher score = more likely to be correct language
         """
-        if not transcription or len(transcription.strip()) == 0:
+        if features['len'] == 0:
             return 0.0
         
-        score = 0.0
-        text = transcription.strip().lower()
-        
         # Length bonus (longer transcriptions are more reliable)
-        score += min(len(text) / 50.0, 1.0) * 0.3
-        
-        # Character-based heuristics
-        if language == 'hindi':
-            # Hindi uses Devanagari script (Unicode range: 0900-097F)
-            devanagari_chars = sum(1 for c in text if '\u0900' <= c <= '\u097F')
-            if len(text) > 0:
-                score += (devanagari_chars / len(text)) * 0.5
-        
-        elif language == 'urdu':
-            # Urdu uses Arabic script (Unicode range: 0600-06FF)
-            arabic_chars = sum(1 for c in text if '\u0600' <= c <= '\u06FF')
-            if len(text) > 0:
-                score += (arabic_chars / len(text)) * 0.5
-        
-        elif language == 'english':
-            # English uses Latin script
-            latin_chars = sum(1 for c in text if c.isalpha() and ord(c) < 128)
-            if len(text) > 0:
-                score += (latin_chars / len(text)) * 0.5
-        
-        elif language == 'telugu':
-            # Telugu uses Telugu script (Unicode range: 0C00-0C7F)
-            telugu_chars = sum(1 for c in text if '\u0C00' <= c <= '\u0C7F')
-            if len(text) > 0:
-                score += (telugu_chars / len(text)) * 0.5
+        score = min(features['len'] / 50.0, 1.0) * 0.3
+        
+        # Character-based heuristics: share of characters in the language's script
+        # (unsigned subtraction turns lo <= c <= hi into a single compare)
+        if language in SCRIPT_RANGES:
+            lo, hi = SCRIPT_RANGES[language]
+            cp = features['cp']
+            in_script = np.count_nonzero((cp - np.uint32(lo)) <= np.uint32(hi - lo))
+            score += (in_script / len(cp)) * 0.5
         
         # Word count bonus
-        words = text.split()
-        if len(words) > 0:
-            score += min(len(words) / 10.0, 1.0) * 0.2
+        if features['words'] > 0:
+            score += min(features['words'] / 10.0, 1.0) * 0.2
         
         return score
     
+    def _calculate_confidence(self, transcription, language):
+        """
+        Calculate confidence score for transcription
+        Higher score = more likely to be correct language
+        """
+        return self._score(self._text_features(transcription), language)
+    
+    def _detect_fast(self, audio_array):
+        """
+        Language ID with the small VoxLingua107 ECAPA model
+        
+        Returns:
+            Supported language name if it is confident enough, else None
+        """
+        if not SPEECHBRAIN_AVAILABLE or self.langid_threshold is None:
+            return None
+        
+        try:
+            import torch
+            
+            if self._langid is None:
+                try:
+                    from speechbrain.inference.classifiers import EncoderClassifier
+                except ImportError:
+                    from speechbrain.pretrained import EncoderClassifier  # SpeechBrain < 1.0
+
+                self._langid = EncoderClassifier.from_hparams(
+                    source="speechbrain/lang-id-voxlingua107-ecapa",
+                    savedir=os.path.join("pretrained_models", "lang-id-voxlingua107-ecapa"),
+                    run_opts={"device": self.device},
+                )
+            
+            _, score, _, labels = self._langid.classify_batch(torch.from_numpy(audio_array).unsqueeze(0))
+            probability = score.exp().item()
+            language = LANGID_CODES.get(labels[0].split(':')[0].strip())
+            
+            if language and probability > self.langid_threshold:
+                print(f"  Fast language ID: {language.capitalize()} (p={probability:.3f})")
+                return language
+        except Exception as e:
+            print(f"  Fast language ID unavailable: {e}")
+            self.langid_threshold = None  # Don't retry a broken model on every call
+        
+        return None
+    
     def detect_language(self, audio_path):
         """
         Detect language from audio file
@@ -139,21 +424,95 @@ class LanguageDetector:
             audio_path: Path to audio file
         
         Returns:
-            Detected language ('hindi', 'english', 'urdu', or 'telugu')
+            Tuple of (language, transcription); language is 'hindi', 'english', 'urdu',
+            or 'telugu'. Transcription is empty when the fast pre-check decided.
         """
         print("Detecting language from audio...")
         
         # Preprocess audio
-        audio_array = self.preprocess_audio(audio_path)
+        audio_array = self._load_clip(audio_path)
+        
+        # Confident fast pre-check skips the Wav2Vec2 pass (no transcription then)
+        language = self._detect_fast(audio_array)
+        if language:
+            print(f"Detected language: {language.upper()}")
+            return language, ""
+        
+        # The model output doesn't depend on the language, so transcribe once
+        # and score that transcription for each supported language
+        return self._pick_language(self._transcribe(audio_array))
+    
+    def detect_language_batch(self, audio_paths, batch_size=8):
+        """
+        Detect language for many audio files, batching the Wav2Vec2 forward passes
+        
+        Args:
+            audio_paths: List of paths to audio files
+            batch_size: Clips per forward pass
+        
+        Returns:
+            List of (language, transcription) tuples, in the same order as audio_paths
+        """
+        print(f"Detecting language for {len(audio_paths)} audio files...")
+        
+        results = [None] * len(audio_paths)
+        pending = []  # (index, audio) for clips the fast pre-check didn't decide
+        for i, path in enumerate(audio_paths):
+            audio_array = self._load_clip(path)
+            language = self._detect_fast(audio_array)
+            if language:
+                results[i] = (language, "")
+            else:
+                pending.append((i, audio_array))
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            transcriptions = self._transcribe_batch([audio for _, audio in batch])
+            for (i, _), transcription in zip(batch, transcriptions):
+                results[i] = self._pick_language(transcription)
+        
+        return results
+    
+    def _transcribe_batch(self, audio_arrays):
+        """Zero-pad clips into one batch, run a single forward pass and decode each row"""
+        import torch
+        
+        try:
+            processor, model = self._load_model()
+            
+            inputs = processor(audio_arrays, sampling_rate=16000, padding=True, return_tensors="pt")
+            inputs = self._to_device(inputs)
+            
+            with torch.inference_mode():
+                logits = model(**inputs).logits
+            
+            predicted_ids = torch.argmax(logits, dim=-1).cpu().numpy()
+            
+            # Drop the frames that only cover padding
+            max_len = max(len(audio) for audio in audio_arrays)
+            transcriptions = []
+            for row, audio in zip(predicted_ids, audio_arrays):
+                frames = int(round(len(row) * len(audio) / max_len))
+                transcriptions.append(self._ctc_decode(processor, row[:frames]))
+            return transcriptions
+        except Exception as e:
+            return [""] * len(audio_arrays)
+    
+    def _pick_language(self, transcription):
+        """
+        Score a transcription for each supported language and pick the best
+        
+        Returns:
+            Tuple of (language, transcription)
+        """
+        features = self._text_features(transcription)
         
-        # Try all supported languages
         languages = ['hindi', 'english', 'urdu', 'telugu']
         results = {}
         
         for lang in languages:
             try:
-                transcription = self._transcribe_with_language(audio_array, lang)
-                confidence = self._calculate_confidence(transcription, lang)
+                confidence = self._score(features, lang)
                 results[lang] = {
                     'transcription': transcription,
                     'confidence': confidence
@@ -171,7 +530,6 @@ class LanguageDetector:
         
         return best_language, results[best_language]['transcription']
 
-
 if __name__ == "__main__":
     # Test the language detector
     detector = LanguageDetector()
@@ -1,10 +1,8 @@
-# Try to import sarvamai
-try:
-    from sarvamai import SarvamAI
-    SARVAM_AVAILABLE = True
-except ImportError:
-    SARVAM_AVAILABLE = False
-    SarvamAI = None
+from importlib.util import find_spec
+
+# sarvamai SDK is optional (requests go over plain HTTP); only check it's installed
+# instead of importing it at startup
+SARVAM_AVAILABLE = find_spec('sarvamai') is not None
 
 # Try to import dotenv
 try:
@@ -14,15 +12,85 @@ except ImportError:
     DOTENV_AVAILABLE = False
     load_dotenv = None
 
+import json
 import os
-import time
+import warnings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Try to import orjson for faster request/response (de)serialization
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    _json_loads = json.loads
+    ORJSON_AVAILABLE = False
 
 # Load .env file if available
 if DOTENV_AVAILABLE:
     load_dotenv()
 
+# Retry rate limits / server errors and failed connects with exponential backoff:
+# urllib3 waits backoff_factor * 2**(n-1) before retry n except the first, so
+# 0s, 4s, 8s, 16s, 30s (capped), with Retry-After taking precedence. POST is
+# retried on those statuses (the chat completion wasn't produced) and when the
+# connection couldn't be opened, but never after the request was sent (read
+# timeouts, dropped connections): the server may already be generating, so a
+# retry could bill and return a duplicate completion.
+_RETRY_ARGS = dict(
+    total=5,
+    read=0,
+    other=0,
+    backoff_factor=2,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=None,
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+try:
+    # urllib3 2.x: add up to 1s of random jitter so concurrent workers that hit
+    # a 429 together don't all retry at the same instant
+    _RETRY = Retry(backoff_jitter=1.0, backoff_max=30, **_RETRY_ARGS)
+except TypeError:
+    # urllib3 1.x has no jitter; its backoff is already capped (at 120s)
+    _RETRY = Retry(**_RETRY_ARGS)
+
+# Shared HTTP session: keeps TLS connections to Sarvam alive across calls
+# and across LLMModule instances (e.g. main LLM + intent analyzer in parallel)
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=_RETRY))
+
+# generate() reports failures as text starting with this prefix instead of raising
+ERROR_PREFIX = 'Error generating response: '
+
+
+def is_rate_limit_error(text):
+    """True if `text` is a generate() error for a request that ended in HTTP 429"""
+    return text.startswith(ERROR_PREFIX) and '(status 429)' in text
+
+
+def _warn_max_retries(max_retries):
+    """Warn callers still passing the per-call max_retries that it has no effect"""
+    if max_retries is not None:
+        warnings.warn("max_retries is ignored: retries are configured on the session's "
+                      "HTTPAdapter (see llm_module._RETRY)", DeprecationWarning, stacklevel=3)
+
+
+# Old model names -> current Sarvam model names
+_MODEL_ALIASES = {
+    'openhathi-hi': 'sarvam-m',
+    'openhathi-en': 'sarvam-m',
+    'openhathi': 'sarvam-m'
+}
+
 class LLMModule:
-    def __init__(self, model_name='sarvam-m', api_key=None):
+    def __init__(self, model_name='sarvam-m', api_key=None, session=None):
         """
         Initialize LLM module with Sarvam AI
         
@@ -32,14 +100,12 @@ class LLMModule:
                 - 'gemma-4b' (Google's Gemma 4B model)
                 - 'gemma-12b' (Google's Gemma 12B model)
             api_key: Sarvam AI API key (if None, reads from SARVAM_API_KEY env var)
+            session: requests.Session to send requests with (default: shared module session)
         """
+        self._session = session or _SESSION
+        
         # Map old model names to new ones for backward compatibility
-        model_mapping = {
-            'openhathi-hi': 'sarvam-m',
-            'openhathi-en': 'sarvam-m',
-            'openhathi': 'sarvam-m'
-        }
-        self.model_name = model_mapping.get(model_name, model_name)
+        self.model_name = _MODEL_ALIASES.get(model_name, model_name)
         self._init_sarvam(api_key)
     
     def _init_sarvam(self, api_key=None):
@@ -63,106 +129,155 @@ class LLMModule:
         print(f"Initialized Sarvam AI. Using model: {self.model_name}")
         print(f"API key: {self.api_key[:10]}... (length: {len(self.api_key)})")
         self.client = None  # We'll use direct HTTP requests instead of the SDK
-
-    def generate(self, prompt, system_prompt=None, max_tokens=100, temperature=0.6, max_retries=3):
-        """Generate response from Sarvam AI with retry logic"""
-        return self._generate_sarvam(prompt, system_prompt, max_tokens, temperature, max_retries)
-    
-    def _generate_sarvam(self, prompt, system_prompt=None, max_tokens=100, temperature=0.6, max_retries=3):
-        """Generate using Sarvam AI API with retry logic for rate limits"""
-        import requests
         
-        # Combine system prompt and user prompt
-        full_prompt = prompt
-        if system_prompt:
-            full_prompt = f"{system_prompt}\n\n{prompt}"
-        
-        # Use Sarvam AI's actual API endpoint
-        headers = {
+        # Request headers are the same for every call
+        self._headers = {
             "api-subscription-key": self.api_key,
             "Content-Type": "application/json"
         }
+
+    def _build_messages(self, prompt, system_prompt=None):
+        """
+        Build the chat messages list
         
+        The system prompt goes in its own message, byte-identical across calls,
+        so the server can reuse the cached prefix instead of re-processing it.
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def generate(self, prompt, system_prompt=None, max_tokens=100, temperature=0.6, max_retries=None):
+        """
+        Generate response from Sarvam AI
+        
+        Retries (429/5xx/failed connects, exponential backoff, Retry-After) are done
+        by the session's adapter; max_retries is deprecated and ignored.
+        """
+        _warn_max_retries(max_retries)
+        return self._generate_sarvam(prompt, system_prompt, max_tokens, temperature)
+    
+    def _generate_sarvam(self, prompt, system_prompt=None, max_tokens=100, temperature=0.6):
+        """Generate using Sarvam AI API (retries handled by the session adapter)"""
         data = {
             "model": self.model_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": full_prompt
-                }
-            ],
+            "messages": self._build_messages(prompt, system_prompt),
             "max_tokens": max_tokens,
             "temperature": temperature
         }
         
-        # Retry logic for rate limits
-        for attempt in range(max_retries):
-            try:
-                # Sarvam AI chat completions endpoint
-                response = requests.post(
-                    "https://api.sarvam.ai/v1/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=30
-                )
-                
-                # Handle rate limit (429) with exponential backoff
-                if response.status_code == 429:
-                    if attempt < max_retries - 1:
-                        wait_time = (2 ** attempt) * 2  # 2, 4, 8 seconds
-                        print(f"⚠️  Rate limit hit. Waiting {wait_time}s before retry {attempt + 1}/{max_retries}...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        error_detail = response.text
-                        raise RuntimeError(f"Sarvam AI API error (status {response.status_code}): {error_detail}")
-                
-                # Check for other errors
-                if response.status_code != 200:
-                    error_detail = response.text
-                    if response.status_code == 401 or response.status_code == 403:
-                        raise ValueError(f"Invalid Sarvam AI API key. Status: {response.status_code}. Please check your API key at https://dashboard.sarvam.ai/")
-                    else:
-                        raise RuntimeError(f"Sarvam AI API error (status {response.status_code}): {error_detail}")
-                
-                result = response.json()
-                
-                # Extract the response text
-                if 'choices' in result and len(result['choices']) > 0:
-                    return result['choices'][0]['message']['content'].strip()
-                elif 'text' in result:
-                    return result['text'].strip()
-                else:
-                    raise RuntimeError(f"Unexpected Sarvam AI response format: {result}")
-                    
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 2
-                    print(f"⚠️  Network error. Retrying in {wait_time}s... ({attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"\n[ERROR] Network error calling Sarvam AI: {e}")
-                    return f"Error generating response: {e}"
-            except Exception as e:
-                error_str = str(e)
-                if "api_key" in error_str.lower() or "authentication" in error_str.lower() or "401" in error_str or "403" in error_str:
-                    print(f"\n[ERROR] Sarvam AI API authentication failed. Check your API key.")
-                elif "rate limit" in error_str.lower() or "429" in error_str:
-                    if attempt < max_retries - 1:
-                        wait_time = (2 ** attempt) * 2
-                        print(f"⚠️  Rate limit exceeded. Retrying in {wait_time}s... ({attempt + 1}/{max_retries})")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"\n[ERROR] Sarvam AI API rate limit exceeded after {max_retries} retries.")
-                        print("Please wait a few minutes before trying again or reduce the number of requests.")
+        try:
+            # Sarvam AI chat completions endpoint
+            response = self._session.post(
+                "https://api.sarvam.ai/v1/chat/completions",
+                headers=self._headers,
+                data=_json_dumps(data),
+                timeout=30
+            )
+            
+            # Check for errors (still failing after the adapter's retries)
+            if response.status_code != 200:
+                error_detail = response.text
+                if response.status_code == 401 or response.status_code == 403:
+                    raise ValueError(f"Invalid Sarvam AI API key. Status: {response.status_code}. Please check your API key at https://dashboard.sarvam.ai/")
                 else:
-                    print(f"\n[ERROR] Sarvam AI API error: {e}")
-                    print(f"Note: Check Sarvam AI documentation for correct API usage: https://docs.sarvam.ai/")
-                return f"Error generating response: {e}"
+                    raise RuntimeError(f"Sarvam AI API error (status {response.status_code}): {error_detail}")
+            
+            result = _json_loads(response.content)
+            
+            # Extract the response text
+            if 'choices' in result and len(result['choices']) > 0:
+                return result['choices'][0]['message']['content'].strip()
+            elif 'text' in result:
+                return result['text'].strip()
+            else:
+                raise RuntimeError(f"Unexpected Sarvam AI response format: {result}")
+                
+        except requests.exceptions.RequestException as e:
+            print(f"\n[ERROR] Network error calling Sarvam AI: {e}")
+            return f"{ERROR_PREFIX}{e}"
+        except Exception as e:
+            error_str = str(e)
+            if "api_key" in error_str.lower() or "authentication" in error_str.lower() or "401" in error_str or "403" in error_str:
+                print(f"\n[ERROR] Sarvam AI API authentication failed. Check your API key.")
+            elif "rate limit" in error_str.lower() or "429" in error_str:
+                print(f"\n[ERROR] Sarvam AI API rate limit exceeded after {_RETRY.total} retries.")
+                print("Please wait a few minutes before trying again or reduce the number of requests.")
+            else:
+                print(f"\n[ERROR] Sarvam AI API error: {e}")
+                print(f"Note: Check Sarvam AI documentation for correct API usage: https://docs.sarvam.ai/")
+            return f"{ERROR_PREFIX}{e}"
+
+    def stream(self, prompt, system_prompt=None, max_tokens=100, temperature=0.6, max_retries=None):
+        """
+        Stream response from Sarvam AI as it is generated
         
-        return "Error: Max retries exceeded"
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            max_retries: Deprecated and ignored (the session adapter retries
+                         rate limits before the first token arrives)
+        
+        Yields:
+            Text deltas in the order they are produced by the model
+        """
+        _warn_max_retries(max_retries)
+        data = {
+            "model": self.model_name,
+            "messages": self._build_messages(prompt, system_prompt),
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        
+        response = self._session.post(
+            "https://api.sarvam.ai/v1/chat/completions",
+            headers=self._headers,
+            data=_json_dumps(data),
+            timeout=30,
+            stream=True
+        )
+        
+        if response.status_code != 200:
+            error_detail = response.text
+            response.close()
+            if response.status_code == 401 or response.status_code == 403:
+                raise ValueError(f"Invalid Sarvam AI API key. Status: {response.status_code}. Please check your API key at https://dashboard.sarvam.ai/")
+            raise RuntimeError(f"Sarvam AI API error (status {response.status_code}): {error_detail}")
+        
+        # A server/model without streaming support answers with one JSON body:
+        # yield it as a single chunk so callers don't have to care
+        if response.headers.get('Content-Type', '').startswith('application/json'):
+            with response:
+                result = _json_loads(response.content)
+            choices = result.get('choices') or []
+            if choices:
+                content = (choices[0].get('message') or {}).get('content')
+                if content:
+                    yield content
+            return
+        
+        # Server-sent events: one "data: {...}" line per delta, ends with "data: [DONE]".
+        # Lines stay bytes and the JSON parser decodes them as UTF-8: requests would
+        # decode a text/event-stream without charset as ISO-8859-1, garbling Hindi/Telugu
+        with response:
+            for line in response.iter_lines():
+                if not line or not line.startswith(b'data:'):
+                    continue
+                payload = line[5:].strip()
+                if payload == b'[DONE]':
+                    return
+                chunk = _json_loads(payload)
+                choices = chunk.get('choices') or []
+                if not choices:
+                    continue
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
 
 
 if __name__ == "__main__":
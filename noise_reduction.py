@@ -3,14 +3,114 @@ Offline Noise Reduction using WebRTC
 Provides real-time noise cancellation for clear audio
 """
 import os
+from contextlib import ExitStack, contextmanager
+from importlib.util import find_spec
+from math import gcd
 import numpy as np
 import soundfile as sf
 
+# Try to import webrtcvad (VAD) and scipy (STFT/iSTFT, resampling) once, at import
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+    webrtcvad = None
+
+try:
+    import scipy.fft
+    from scipy.ndimage import minimum_filter1d
+    from scipy.signal import stft, istft, resample_poly
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# Try to import soxr (C++/SIMD resampler); scipy's polyphase resampler otherwise
+try:
+    import soxr
+    SOXR_AVAILABLE = True
+except ImportError:
+    SOXR_AVAILABLE = False
+    soxr = None
+
+# torch is only imported (lazily) to run spectral subtraction on a CUDA GPU
+TORCH_AVAILABLE = find_spec('torch') is not None
+
+# Try to import pyfftw (FFTW plans, cached across calls) as a scipy.fft backend
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft
+    pyfftw.interfaces.cache.enable()
+    pyfftw.interfaces.cache.set_keepalive_time(60)
+    PYFFTW_AVAILABLE = True
+except ImportError:
+    PYFFTW_AVAILABLE = False
+    pyfftw = None
+
+# Try to import numba for the fused spectral-subtraction kernel
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _spectral_subtract_kernel(Z, noise, alpha, beta, out):
+        """Subtract alpha*noise from |Z| with a beta*|Z| floor, keep the phase (one pass)"""
+        for k in prange(Z.shape[0]):
+            n = alpha * noise[k]
+            for t in range(Z.shape[1]):
+                z = Z[k, t]
+                mag = abs(z)
+                if mag > 1e-12:
+                    m = mag - n
+                    floor = beta * mag
+                    if m < floor:
+                        m = floor
+                    out[k, t] = z * (m / mag)
+                else:
+                    out[k, t] = 0
+
+
+@contextmanager
+def _fft_context():
+    """Multi-threaded FFTs for scipy.signal.stft/istft, through FFTW when installed"""
+    with ExitStack() as stack:
+        if PYFFTW_AVAILABLE:
+            stack.enter_context(scipy.fft.set_backend(pyfftw.interfaces.scipy_fft))
+        stack.enter_context(scipy.fft.set_workers(os.cpu_count() or 1))
+        yield
+
+
+def _resample(audio, sr, target_sr=16000):
+    """Resample audio from sr to target_sr without pulling in librosa"""
+    if SOXR_AVAILABLE:
+        return soxr.resample(audio, sr, target_sr, quality='HQ')
+    if not SCIPY_AVAILABLE:
+        raise ImportError("Resampling needs soxr or scipy: pip install soxr")
+    g = gcd(sr, target_sr)
+    return resample_poly(audio, target_sr // g, sr // g)
+
 
 class NoiseReducer:
-    def __init__(self):
-        """Initialize noise reduction with WebRTC"""
+    def __init__(self, noise_profile_path=None):
+        """
+        Initialize noise reduction with WebRTC
+        
+        Args:
+            noise_profile_path: .npy file for a learned noise profile (see learn_noise);
+                                loaded if it exists, written by learn_noise
+        """
         self.webrtc_available = False
+        
+        # Fixed noise spectrum shared by all files (None = estimate per file)
+        self.noise_profile_path = noise_profile_path
+        self._noise_profile = None
+        self._cuda = None  # Resolved on first spectral subtraction
+        if noise_profile_path and os.path.exists(noise_profile_path):
+            self._noise_profile = np.load(noise_profile_path)
+            print(f"[INFO] Loaded noise profile from {noise_profile_path}")
         self._init_webrtc()
         
         if not self.webrtc_available:
@@ -20,20 +120,20 @@ class NoiseReducer:
     
     def _init_webrtc(self):
         """Initialize WebRTC VAD and Noise Suppression"""
-        try:
-            import webrtcvad
-            self.webrtc_available = True
+        self.webrtc_available = WEBRTCVAD_AVAILABLE
+        if WEBRTCVAD_AVAILABLE:
+            # One VAD instance, reused for every file
             self.webrtc_vad = webrtcvad.Vad(2)  # Aggressiveness: 0-3, 2 is balanced
-        except ImportError:
-            self.webrtc_available = False
     
-    def reduce_noise_webrtc(self, audio_path, output_path=None):
+    def reduce_noise_webrtc(self, audio_path, output_path=None, audio=None):
         """
         Apply WebRTC noise suppression and VAD
         
         Args:
             audio_path: Input audio file path
             output_path: Output audio file path (if None, overwrites input)
+            audio: Optional (int16 samples, sample rate) already holding the contents
+                   of audio_path, e.g. from the recorder, to skip reading it back
         
         Returns:
             Path to processed audio file
@@ -45,23 +145,11 @@ class NoiseReducer:
             output_path = audio_path
         
         try:
-            import webrtcvad
-            
-            # Load audio
-            audio, sr = sf.read(audio_path)
-            
-            # Convert to mono if stereo
-            if len(audio.shape) > 1:
-                audio = np.mean(audio, axis=1)
-            
-            # WebRTC VAD requires 16kHz, 16-bit PCM, mono
-            if sr != 16000:
-                import librosa
-                audio = librosa.resample(audio, orig_sr=sr, target_sr=16000)
-                sr = 16000
-            
-            # Convert to int16 PCM
-            audio_int16 = (audio * 32767).astype(np.int16)
+            # Load audio (WebRTC VAD requires 16kHz, 16-bit PCM, mono)
+            if audio is not None:
+                audio_int16, sr = self._int16_16k(*audio)
+            else:
+                audio_int16, sr = self._load_int16_16k(audio_path)
             
             # Apply VAD (Voice Activity Detection) - removes silence
             print("[AUDIO] Applying WebRTC VAD (removing silence)...")
@@ -70,39 +158,48 @@ class NoiseReducer:
             # Ensure frame size is even (required by WebRTC)
             frame_size = (frame_size // 2) * 2
             
-            vad = webrtcvad.Vad(2)  # Aggressiveness: 0-3, 2 is balanced
-            frames = []
-            
-            # Process audio in frames
-            for i in range(0, len(audio_int16) - frame_size, frame_size):
-                frame = audio_int16[i:i + frame_size]
-                
-                # Ensure frame is exactly the right size
-                if len(frame) == frame_size:
-                    frame_bytes = frame.tobytes()
-                    
-                    # Check if frame contains speech
-                    try:
-                        if vad.is_speech(frame_bytes, sr):
-                            frames.append(frame)
-                    except Exception as e:
-                        # If VAD fails, include frame anyway
-                        frames.append(frame)
-            
-            if len(frames) == 0:
+            vad = self.webrtc_vad
+            
+            # View the audio as (n_frames, frame_size) and classify each frame from
+            # a byte view of the samples: memoryview slices are zero-copy, so no
+            # bytes object is built per frame (webrtcvad accepts any buffer)
+            n_frames = len(audio_int16) // frame_size
+            frames2d = np.ascontiguousarray(audio_int16[:n_frames * frame_size].reshape(n_frames, frame_size))
+            buf = memoryview(frames2d).cast('B')
+            step = frame_size * 2  # bytes per frame (int16)
+            
+            def _is_speech(i):
+                try:
+                    return vad.is_speech(buf[i * step:(i + 1) * step], sr)
+                except Exception:
+                    # If VAD fails, include frame anyway
+                    return True
+            
+            # Energy gate: frames quieter than -50 dBFS are silence, so only the
+            # rest cost a vad.is_speech call
+            mean_square = np.einsum('ij,ij->i', frames2d, frames2d, dtype=np.float64) / frame_size
+            active = np.flatnonzero(mean_square > (32767.0 * 10 ** (-50 / 20)) ** 2)
+            
+            speech_mask = np.zeros(n_frames, dtype=bool)
+            speech_mask[active] = np.fromiter((_is_speech(i) for i in active), dtype=bool, count=len(active))
+            
+            if not speech_mask.any():
                 print("[WARNING] No speech detected after VAD")
                 return audio_path
             
-            # Combine frames
-            audio_processed = np.concatenate(frames)
+            # Combine frames: one boolean-mask gather into a single new array, then
+            # scale to float in place (no per-frame list or concatenate pass)
+            audio_processed = frames2d[speech_mask].reshape(-1).astype(np.float32)
+            audio_processed *= 1.0 / 32767.0
             
             # Apply noise suppression using spectral subtraction
             print("[AUDIO] Applying spectral noise suppression...")
-            audio_processed = self._spectral_subtraction(audio_processed.astype(np.float32) / 32767.0, sr)
+            audio_processed = self._spectral_subtraction(audio_processed, sr)
             
             # Normalize
-            if len(audio_processed) > 0 and np.max(np.abs(audio_processed)) > 0:
-                audio_processed = audio_processed / np.max(np.abs(audio_processed))
+            peak = np.max(np.abs(audio_processed)) if len(audio_processed) > 0 else 0
+            if peak > 0:
+                audio_processed /= peak
             
             # Save processed audio
             sf.write(output_path, audio_processed, sr)
@@ -114,6 +211,82 @@ class NoiseReducer:
         
         return output_path
     
+    def _load_mono_16k(self, audio_path):
+        """Read an audio file as mono float audio at 16 kHz"""
+        audio, sr = sf.read(audio_path)
+        
+        # Convert to mono if stereo
+        if len(audio.shape) > 1:
+            audio = np.mean(audio, axis=1)
+        
+        if sr != 16000:
+            audio = _resample(audio, sr)
+            sr = 16000
+        
+        return audio, sr
+    
+    def _load_int16_16k(self, audio_path):
+        """
+        Read an audio file as mono int16 PCM at 16 kHz
+        
+        16 kHz files are decoded straight to int16 into a preallocated buffer
+        (no float64 copy or quantize pass); other rates go through the float
+        resampler and are quantized once.
+        """
+        with sf.SoundFile(audio_path) as f:
+            sr = f.samplerate
+            if sr != 16000:
+                audio, sr = self._load_mono_16k(audio_path)
+                return (audio * 32767).astype(np.int16), sr
+            
+            shape = (f.frames,) if f.channels == 1 else (f.frames, f.channels)
+            buf = f.read(dtype='int16', out=np.empty(shape, dtype=np.int16))
+        
+        if buf.ndim == 1:
+            return buf, sr
+        # Downmix in integer arithmetic (int32 accumulator avoids overflow)
+        return (buf.sum(axis=1, dtype=np.int32) // buf.shape[1]).astype(np.int16), sr
+    
+    def _int16_16k(self, pcm, sr):
+        """Bring in-memory int16 samples ((n,) or (n, channels)) to mono int16 at 16 kHz"""
+        pcm = np.asarray(pcm, dtype=np.int16)
+        if pcm.ndim > 1:
+            pcm = (pcm.sum(axis=1, dtype=np.int32) // pcm.shape[1]).astype(np.int16)
+        if sr != 16000:
+            pcm = (_resample(pcm.astype(np.float32) / 32768.0, sr) * 32767).astype(np.int16)
+            sr = 16000
+        return pcm, sr
+    
+    def learn_noise(self, audio_path, seconds=0.5):
+        """
+        Learn a noise profile once and reuse it for every following file
+        
+        Useful when many recordings share a device/room: each file then skips its
+        own noise estimate. Saved to noise_profile_path if one was given.
+        
+        Args:
+            audio_path: Recording whose first `seconds` contain only background noise
+            seconds: Length of the noise-only lead-in
+        
+        Returns:
+            The noise magnitude spectrum (n_fft // 2 + 1 bins)
+        """
+        if not SCIPY_AVAILABLE:
+            raise ImportError("Learning a noise profile needs scipy: pip install scipy")
+        
+        audio, sr = self._load_mono_16k(audio_path)
+        n_fft, hop_length = 2048, 512
+        _, _, Z = stft(audio[:int(seconds * sr)], fs=sr, nperseg=n_fft, noverlap=n_fft - hop_length)
+        self._noise_profile = np.mean(np.abs(Z), axis=1)
+        
+        if self.noise_profile_path:
+            np.save(self.noise_profile_path, self._noise_profile)
+        return self._noise_profile
+    
+    def clear_noise_profile(self):
+        """Go back to estimating noise from each file"""
+        self._noise_profile = None
+    
     def _spectral_subtraction(self, audio, sr, alpha=2.0, beta=0.01):
         """
         Simple spectral subtraction for noise reduction (fallback method)
@@ -128,50 +301,161 @@ class NoiseReducer:
             Noise-reduced audio
         """
         try:
-            import librosa
-            import scipy.signal
-            
-            # Compute STFT
-            stft = librosa.stft(audio, n_fft=2048, hop_length=512)
-            magnitude = np.abs(stft)
-            phase = np.angle(stft)
-            
-            # Estimate noise from first 0.5 seconds (assuming it's mostly noise)
-            noise_frames = int(0.5 * sr / 512)
-            if noise_frames > 0 and noise_frames < magnitude.shape[1]:
-                noise_spectrum = np.mean(magnitude[:, :noise_frames], axis=1, keepdims=True)
+            if self._cuda is None:
+                self._cuda = False
+                if TORCH_AVAILABLE:
+                    import torch
+                    self._cuda = torch.cuda.is_available()
+            if self._cuda:
+                return self._spectral_subtraction_torch(audio, sr, alpha, beta)
+            
+            if not SCIPY_AVAILABLE:
+                print("[WARNING] Spectral subtraction skipped: scipy not installed")
+                return audio
+            
+            # Whole pipeline in float32/complex64 (scipy keeps single precision):
+            # half the memory traffic of float64 for the same quality
+            audio = np.asarray(audio, dtype=np.float32)
+            
+            # Compute STFT (one-sided spectrum of the real signal, hop 512)
+            n_fft, hop_length = 2048, 512
+            with _fft_context():
+                _, _, Z = stft(audio, fs=sr, nperseg=n_fft, noverlap=n_fft - hop_length)
+            
+            magnitude = np.abs(Z)
+            
+            # Use the learned noise profile, or estimate noise by minimum statistics:
+            # per-bin minimum over a sliding ~1.5 s window, then the median over time
+            # (x1.5 to offset the minimum's downward bias). Unlike averaging the first
+            # 0.5 s, this holds up when speech starts immediately.
+            if self._noise_profile is not None and self._noise_profile.shape[0] == Z.shape[0]:
+                noise_spectrum = self._noise_profile.astype(np.float32, copy=False)[:, np.newaxis]
             else:
-                noise_spectrum = np.mean(magnitude, axis=1, keepdims=True) * 0.1
+                win = max(1, min(int(1.5 * sr / hop_length), Z.shape[1]))
+                noise_floor = minimum_filter1d(magnitude, size=win, axis=1, mode='nearest')
+                noise_spectrum = np.median(noise_floor, axis=1, keepdims=True) * 1.5
             
             # Spectral subtraction
-            magnitude_clean = magnitude - alpha * noise_spectrum
-            magnitude_clean = np.maximum(magnitude_clean, beta * magnitude)
+            if NUMBA_AVAILABLE:
+                Z_clean = np.empty_like(Z)
+                _spectral_subtract_kernel(Z, noise_spectrum[:, 0], alpha, beta, Z_clean)
+            else:
+                # Real-valued gain clean/|Z| applied to Z keeps the phase without
+                # building a complex phasor array; intermediate steps run in place
+                gain = np.subtract(magnitude, alpha * noise_spectrum)
+                np.maximum(gain, beta * magnitude, out=gain)
+                np.divide(gain, np.maximum(magnitude, 1e-12, out=magnitude), out=gain)
+                Z_clean = np.multiply(Z, gain, out=Z)
             
             # Reconstruct audio
-            stft_clean = magnitude_clean * np.exp(1j * phase)
-            audio_clean = librosa.istft(stft_clean, hop_length=512)
+            with _fft_context():
+                _, audio_clean = istft(Z_clean, fs=sr, nperseg=n_fft, noverlap=n_fft - hop_length)
+            audio_clean = audio_clean[:len(audio)]
             
             return audio_clean
         except Exception as e:
             print(f"[WARNING] Spectral subtraction failed: {e}")
             return audio
     
-    def reduce_noise(self, audio_path, output_path=None):
+    def _spectral_subtraction_torch(self, audio, sr, alpha, beta):
+        """Same subtraction as _spectral_subtraction, on the GPU with torch.stft/istft"""
+        import torch
+        
+        n_fft, hop_length = 2048, 512
+        window = torch.hann_window(n_fft, device='cuda')
+        # scipy's stft scales by 1/sum(window); match it so learned profiles carry over
+        scale = float(window.sum())
+        
+        with torch.inference_mode():
+            a = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)).to('cuda', non_blocking=True)
+            Z = torch.stft(a, n_fft=n_fft, hop_length=hop_length, window=window, return_complex=True) / scale
+            magnitude = Z.abs()
+            
+            if self._noise_profile is not None and self._noise_profile.shape[0] == Z.shape[0]:
+                noise_spectrum = torch.as_tensor(self._noise_profile, dtype=magnitude.dtype, device='cuda')[:, None]
+            else:
+                # Minimum statistics, as in _spectral_subtraction (trailing windows)
+                win = max(1, min(int(1.5 * sr / hop_length), Z.shape[1]))
+                noise_floor = magnitude.unfold(1, win, 1).amin(dim=-1)
+                noise_spectrum = noise_floor.median(dim=1, keepdim=True).values * 1.5
+            
+            magnitude_clean = torch.maximum(magnitude - alpha * noise_spectrum, beta * magnitude)
+            Z_clean = Z * (magnitude_clean / magnitude.clamp_min(1e-12)) * scale
+            audio_clean = torch.istft(Z_clean, n_fft=n_fft, hop_length=hop_length, window=window, length=len(audio))
+            return audio_clean.cpu().numpy()
+    
+    def reduce_noise_array(self, audio, sr=16000):
+        """
+        Apply spectral noise suppression to an in-memory phrase
+        
+        For streamed recordings: there is no file, and silence is already dropped
+        by the stream's pause detection and Whisper's VAD, so only the
+        suppression step of reduce_noise_webrtc is applied.
+        
+        Args:
+            audio: Mono float32 array in [-1, 1]
+            sr: Sample rate of `audio`
+        
+        Returns:
+            Noise-reduced float32 array (audio unchanged if noise reduction is unavailable)
+        """
+        if not self.webrtc_available or len(audio) < 2048:
+            return audio
+        return self._spectral_subtraction(np.asarray(audio, dtype=np.float32), sr)
+    
+    def reduce_noise(self, audio_path, output_path=None, audio=None):
         """
         Apply noise reduction using WebRTC
         
         Args:
             audio_path: Input audio file path
             output_path: Output audio file path (if None, overwrites input)
+            audio: Optional (int16 samples, sample rate) matching audio_path's contents
         
         Returns:
             Path to processed audio file
         """
         if self.webrtc_available:
-            return self.reduce_noise_webrtc(audio_path, output_path)
+            return self.reduce_noise_webrtc(audio_path, output_path, audio=audio)
         return audio_path
 
 
+# Per-process reducer used by reduce_noise_files workers
+_worker_reducer = None
+
+
+def _init_worker(noise_profile_path):
+    """ProcessPoolExecutor initializer: build one NoiseReducer per worker process"""
+    global _worker_reducer
+    _worker_reducer = NoiseReducer(noise_profile_path=noise_profile_path)
+
+
+def _reduce_in_worker(audio_path):
+    return _worker_reducer.reduce_noise(audio_path)
+
+
+def reduce_noise_files(audio_paths, max_workers=None, noise_profile_path=None):
+    """
+    Noise-reduce many files in parallel worker processes (in place)
+    
+    webrtcvad.is_speech holds the GIL, so threads don't parallelize the VAD
+    loop; separate processes do.
+    
+    Args:
+        audio_paths: Input audio file paths
+        max_workers: Number of worker processes (None = CPU count)
+        noise_profile_path: Optional learned noise profile shared by all workers
+    
+    Returns:
+        List of processed audio paths, in input order
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(noise_profile_path,)) as executor:
+        return list(executor.map(_reduce_in_worker, audio_paths))
+
+
 if __name__ == "__main__":
     reducer = NoiseReducer()
     print(f"WebRTC available: {reducer.webrtc_available}")
@@ -0,0 +1,96 @@
+"""
+Prepare Piper Models
+Creates simplified (onnxsim) and int8-quantized copies of the Piper voices
+in the piper folder
+
+Run once after downloading a voice:
+    python prepare_piper_models.py [piper_dir]
+
+TTSModule picks <voice>.int8.onnx, then <voice>.sim.onnx, then <voice>.onnx.
+"""
+
+import os
+import shutil
+import sys
+from importlib.util import find_spec
+
+ONNXSIM_AVAILABLE = find_spec('onnxsim') is not None
+
+
+def simplify_model(model_path):
+    """
+    Write a constant-folded (onnxsim) copy of a Piper model
+    
+    Args:
+        model_path: Path to the fp32 <voice>.onnx model
+        
+    Returns:
+        Path to <voice>.sim.onnx, or model_path if onnxsim is unavailable or fails
+    """
+    if not ONNXSIM_AVAILABLE:
+        return model_path
+    
+    out_path = model_path[:-len('.onnx')] + '.sim.onnx'
+    try:
+        import onnx
+        import onnxsim
+        
+        simplified, ok = onnxsim.simplify(model_path)
+        if not ok:
+            print(f"[WARNING] onnxsim could not validate {os.path.basename(model_path)}, skipping")
+            return model_path
+        onnx.save(simplified, out_path)
+        shutil.copyfile(model_path + '.json', out_path + '.json')
+        return out_path
+    except Exception as e:
+        print(f"[WARNING] Simplifying {os.path.basename(model_path)} failed: {e}")
+        return model_path
+
+
+def quantize_model(model_path):
+    """
+    Write an int8 (dynamic, weight-only) copy of a Piper model
+    
+    Args:
+        model_path: Path to the model to quantize (<voice>.onnx or <voice>.sim.onnx)
+        
+    Returns:
+        Path to <voice>.int8.onnx
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    base = model_path[:-len('.onnx')]
+    if base.endswith('.sim'):
+        base = base[:-len('.sim')]
+    out_path = base + '.int8.onnx'
+    quantize_dynamic(model_path, out_path, weight_type=QuantType.QInt8)
+    # Piper (and piper.exe) read the voice config from <model>.json
+    shutil.copyfile(model_path + '.json', out_path + '.json')
+    return out_path
+
+
+def prepare_models(piper_dir='piper'):
+    """Simplify and quantize every fp32 Piper voice in piper_dir that has no int8 copy yet"""
+    files = set(os.listdir(piper_dir))
+    voices = sorted(f[:-len('.onnx')] for f in files
+                    if f.endswith('.onnx') and f + '.json' in files
+                    and not f.endswith(('.int8.onnx', '.sim.onnx')))
+    
+    if not voices:
+        print(f"No Piper voices found in {piper_dir}")
+        return
+    
+    for voice in voices:
+        if voice + '.int8.onnx' in files:
+            print(f"✓ {voice} (already quantized)")
+            continue
+        model_path = os.path.join(piper_dir, voice + '.onnx')
+        # Quantize the constant-folded graph when onnxsim is installed
+        out_path = quantize_model(simplify_model(model_path))
+        size_in = os.path.getsize(model_path) / 1e6
+        size_out = os.path.getsize(out_path) / 1e6
+        print(f"✓ {voice}: {size_in:.1f} MB -> {size_out:.1f} MB ({os.path.basename(out_path)})")
+
+
+if __name__ == "__main__":
+    prepare_models(sys.argv[1] if len(sys.argv) > 1 else 'piper')
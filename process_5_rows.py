@@ -3,7 +3,11 @@ Process first 5 rows from Transcript-24-11-2025.xlsx
 Read transcriptions, generate summary and intent, save to IntentOfthetranscribetext.xlsx
 """
 
+import io
 import os
+import re
+
+_SET_PREFIX_RE = re.compile(r'^[ \t]*set[ \t]+', re.MULTILINE)
 
 # Load .env file FIRST, before anything else
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,27 +22,17 @@ try:
             with open(env_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Check if file has 'set' keyword and fix it
-            if content.strip().startswith('set '):
+            # Strip Windows-style 'set ' prefixes in one regex pass; only rewrite
+            # the file when something actually changed
+            content, n_fixed = _SET_PREFIX_RE.subn('', content)
+            if n_fixed:
                 print("⚠️  Found 'set' keyword in .env file, fixing it...")
-                # Remove 'set ' from the beginning of lines
-                lines = content.split('\n')
-                fixed_lines = []
-                for line in lines:
-                    if line.strip().startswith('set '):
-                        # Remove 'set ' prefix
-                        fixed_line = line.replace('set ', '', 1).strip()
-                        fixed_lines.append(fixed_line)
-                    else:
-                        fixed_lines.append(line)
-                
-                # Write back the fixed content
                 with open(env_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(fixed_lines))
+                    f.write(content)
                 print("✓ Fixed .env file (removed 'set' keyword)")
             
-            # Now load the .env file
-            load_dotenv(env_path, override=True)
+            # Load from the content already in memory instead of re-reading the file
+            load_dotenv(stream=io.StringIO(content), override=True)
             print(f"✓ Loaded .env file from: {env_path}")
         except Exception as e:
             print(f"⚠️  Error reading/fixing .env file: {e}")
@@ -11,8 +11,7 @@ from dotenv import load_dotenv
 # Load .env file
 load_dotenv()
 
-from process_transcribe_to_excel import TranscribeProcessor
-from openpyxl import load_workbook
+from process_transcribe_to_excel import TranscribeProcessor, group_duplicate_rows, read_source_rows
 
 
 class FastBulkProcessor:
@@ -80,56 +79,52 @@ class FastBulkProcessor:
         print(f"{'='*60}\n")
         
         # Read all rows first
-        wb = load_workbook(source_excel_file, read_only=True)
-        ws = wb.active
+        rows_data = read_source_rows(source_excel_file, limit, audio_col, transcribe_col)
         
-        total_rows = ws.max_row
-        rows_to_process = min(limit, total_rows - 1)
+        # Identical transcriptions are processed once; empty rows never reach the API
+        groups, empty_rows = group_duplicate_rows(rows_data)
         
-        # Collect all rows to process
-        rows_data = []
-        for row_idx in range(2, min(2 + limit, total_rows + 1)):
-            audio_name = ws.cell(row=row_idx, column=audio_col).value
-            transcribed_text = ws.cell(row=row_idx, column=transcribe_col).value
-            rows_data.append((row_idx, audio_name, transcribed_text))
-        
-        wb.close()
-        
-        print(f"Collected {len(rows_data)} rows to process\n")
+        print(f"Collected {len(rows_data)} rows to process ({len(groups)} unique, {len(empty_rows)} empty)\n")
         
         # Process rows concurrently
         processed = 0
         failed = 0
-        skipped = 0
+        skipped = len(empty_rows)
         start_time = time.time()
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_row = {executor.submit(self.process_single_row, row_data): row_data for row_data in rows_data}
-            
-            # Process completed tasks
-            for future in as_completed(future_to_row):
-                row_data = future_to_row[future]
-                row_idx = row_data[0]
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Submit one task per unique transcription
+                future_to_rows = {executor.submit(self.process_single_row, rows[0]): rows for rows in groups.values()}
                 
-                try:
-                    result_row_idx, result, error = future.result()
+                # Process completed tasks
+                for future in as_completed(future_to_rows):
+                    rows = future_to_rows[future]
+                    row_idx = rows[0][0]
                     
-                    if result:
-                        # Save to Excel
-                        self.processor.save_to_excel(result)
-                        processed += 1
-                        print(f"✓ [{processed + failed + skipped}/{len(rows_data)}] Row {result_row_idx} processed")
-                    elif error:
-                        failed += 1
-                        if error != "Empty transcription":
+                    try:
+                        result_row_idx, result, error = future.result()
+                        
+                        if result:
+                            # Duplicates reuse the result under their own audio name;
+                            # buffered and written to Excel in batches
+                            for dup_row_idx, audio_name, _ in rows:
+                                self.processor.queue_for_excel(dict(result, audio_name=audio_name or ''))
+                                processed += 1
+                                print(f"✓ [{processed + failed + skipped}/{len(rows_data)}] Row {dup_row_idx} processed")
+                        elif error:
+                            failed += len(rows)
                             print(f"✗ [{processed + failed + skipped}/{len(rows_data)}] Row {result_row_idx} failed: {error}")
-                        else:
-                            skipped += 1
-                    
-                except Exception as e:
-                    failed += 1
-                    print(f"✗ Row {row_idx} exception: {e}")
+                        
+                    except Exception as e:
+                        failed += len(rows)
+                        print(f"✗ Row {row_idx} exception: {e}")
+        finally:
+            # Write whatever is still buffered, even if the run is interrupted
+            self.processor.flush_excel()
+        
+        self.processor.intent_analyzer.save_cache()
+        self.processor.llm_cache.report()
         
         # Summary
         elapsed_time = time.time() - start_time
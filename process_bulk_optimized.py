@@ -1,51 +1,136 @@
 """
 Optimized Bulk Processing with Smart Rate Limiting
-- Reduces workers when rate limits are hit
+- Paces requests with a shared token bucket (AIMD: halved on rate limits, regrown on success)
 - Adds delays between batches
 - Processes in smaller batches to avoid overwhelming the API
 """
 
+import csv
 import os
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from process_transcribe_to_excel import TranscribeProcessor
-from openpyxl import load_workbook
+from llm_module import is_rate_limit_error
+from process_transcribe_to_excel import TranscribeProcessor, group_duplicate_rows, read_source_rows
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, max_rate=None, increase=None):
+        """
+        Thread-safe token bucket shared by all workers, with AIMD rate control
+        
+        The rate grows additively on success (up to max_rate) and is halved on a
+        rate limit, so it settles just under what the API actually allows.
+        
+        Args:
+            rate: Starting tokens per second (sustained requests/second)
+            capacity: Maximum tokens (burst size)
+            max_rate: Highest rate to grow to (default: the starting rate)
+            increase: Rate added per success (default: rate / 10)
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.max_rate = max_rate or rate
+        self.min_rate = rate / 16
+        self.increase = increase if increase is not None else rate / 10
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = time.monotonic()
+        self._cond = threading.Condition()
+    
+    def _refill(self, now):
+        """Add tokens for the time elapsed (caller holds the lock)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+    
+    def take(self):
+        """Block until a token is available, then consume it"""
+        with self._cond:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                self._cond.wait((1 - self.tokens) / self.rate)
+    
+    def on_success(self):
+        """Additive increase after a request that wasn't rate limited"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+    
+    def slow_down(self):
+        """Multiplicative decrease (called when the API reports a rate limit)"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = max(self.rate / 2, self.min_rate)
+    
+    def record(self, result):
+        """
+        Adjust the rate from a process_text result
+        
+        LLM errors come back as the summary text; only an error whose HTTP status
+        was 429 counts as a rate limit (not any summary that mentions "429").
+        """
+        if result and is_rate_limit_error(result.get('summary', '')):
+            print(f"  ⏸️  Rate limited, halving request rate", flush=True)
+            self.slow_down()
+        elif result:
+            self.on_success()
 
 
 class OptimizedBulkProcessor:
-    def __init__(self, excel_file='IntentOfthetranscribetext.xlsx', language='hindi', api_key=None):
-        """Initialize Optimized Bulk Processor"""
+    def __init__(self, excel_file='IntentOfthetranscribetext.xlsx', language='hindi', api_key=None,
+                 requests_per_second=2.0, csv_path=None):
+        """
+        Initialize Optimized Bulk Processor
+        
+        Args:
+            excel_file: Output Excel file path
+            language: Language for processing
+            api_key: Sarvam AI API key
+            requests_per_second: Rows started per second across all workers (set to your API quota)
+            csv_path: Optional CSV file each result is appended to as soon as it arrives;
+                      the Excel file is then written once at the end of the run
+        """
+        self.csv_path = csv_path
+        self._csv_file = None
+        self._csv_writer = None
         self.processor = TranscribeProcessor(
             excel_file=excel_file,
             llm_model='sarvam-m',
             language=language,
             api_key=api_key
         )
-        self.rate_limit_delay = 1.5  # Delay between requests in seconds
-        print(f"✓ Initialized with smart rate limiting ({self.rate_limit_delay}s delay)")
+        # Workers proceed immediately while tokens are available instead of always sleeping
+        self.bucket = TokenBucket(rate=requests_per_second, capacity=max(1.0, requests_per_second))
+        print(f"✓ Initialized with smart rate limiting ({requests_per_second} rows/s)")
     
     def process_single_row(self, row_data):
-        """Process a single row with rate limit delay"""
+        """Process a single row once the rate limiter allows it"""
         row_idx, audio_name, transcribed_text = row_data
         
-        # Add delay to avoid rate limits
-        time.sleep(self.rate_limit_delay)
-        
         try:
             if not transcribed_text or not str(transcribed_text).strip():
                 return (row_idx, None, "Empty")
             
             transcribed_text = str(transcribed_text).strip()
             
+            # Wait for a rate-limit token (empty rows above don't need one)
+            self.bucket.take()
+            
             # Print immediately when starting
             print(f"  🔄 Processing row {row_idx}...", flush=True)
             
             result = self.processor.process_text(transcribed_text, audio_name)
             
+            # Back off if we were rate limited, recover on success
+            self.bucket.record(result)
+            
             if result:
                 return (row_idx, result, None)
             else:
@@ -54,6 +139,25 @@ class OptimizedBulkProcessor:
         except Exception as e:
             return (row_idx, None, str(e))
     
+    def _open_csv(self):
+        """Open the CSV results stream (append mode, header only for a new file)"""
+        is_new = not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0
+        self._csv_file = open(self.csv_path, 'a', newline='', encoding='utf-8')
+        self._csv_writer = csv.writer(self._csv_file)
+        if is_new:
+            self._csv_writer.writerow(['Audio Name', 'Transcribe', 'Summary', 'Intent'])
+    
+    def _record(self, result):
+        """Stream a result to the CSV (if enabled) and buffer it for Excel"""
+        if self._csv_writer is None:
+            self.processor.queue_for_excel(result)
+            return
+        
+        self._csv_writer.writerow([result['audio_name'], result['transcribe'], result['summary'], result['intent']])
+        self._csv_file.flush()
+        # The CSV already has the row durably; write Excel only once, in flush_excel
+        self.processor.queue_for_excel(result, flush_every=float('inf'))
+    
     def process_from_excel_optimized(self, source_excel_file, limit=100, batch_size=5):
         """
         Process Excel file in batches with smart rate limiting
@@ -72,70 +176,80 @@ class OptimizedBulkProcessor:
         print(f"{'='*60}")
         print(f"📖 Source: {source_excel_file}")
         print(f"💾 Output: {self.processor.excel_file}")
+        if self.csv_path:
+            print(f"📝 Streaming to: {self.csv_path}")
         print(f"📊 Total rows: {limit}")
         print(f"⚡ Batch size: {batch_size} concurrent requests")
-        print(f"⏱️  Delay: {self.rate_limit_delay}s between requests")
+        print(f"⏱️  Rate: {self.bucket.base_rate} rows/s (token bucket)")
         print(f"{'='*60}\n")
         
         # Read all rows
-        wb = load_workbook(source_excel_file, read_only=True)
-        ws = wb.active
-        
-        total_rows = ws.max_row
-        rows_to_process = min(limit, total_rows - 1)
+        rows_data = read_source_rows(source_excel_file, limit)
         
-        rows_data = []
-        for row_idx in range(2, min(2 + limit, total_rows + 1)):
-            audio_name = ws.cell(row=row_idx, column=1).value
-            transcribed_text = ws.cell(row=row_idx, column=2).value
-            rows_data.append((row_idx, audio_name, transcribed_text))
-        
-        wb.close()
+        # Identical transcriptions are processed once; empty rows never reach the API
+        groups, empty_rows = group_duplicate_rows(rows_data)
+        unique_rows = list(groups.values())
+        print(f"📋 {len(rows_data)} rows: {len(unique_rows)} unique, {len(empty_rows)} empty")
         
         # Process in batches
         processed = 0
         failed = 0
-        skipped = 0
+        skipped = len(empty_rows)
         start_time = time.time()
         
-        total_batches = (len(rows_data) + batch_size - 1) // batch_size
+        total_batches = (len(unique_rows) + batch_size - 1) // batch_size
         
-        for batch_num in range(0, len(rows_data), batch_size):
-            batch = rows_data[batch_num:batch_num + batch_size]
-            current_batch = batch_num // batch_size + 1
-            
-            print(f"\n📦 Batch {current_batch}/{total_batches} ({len(batch)} rows)")
-            print("-" * 60)
-            
-            with ThreadPoolExecutor(max_workers=batch_size) as executor:
-                future_to_row = {executor.submit(self.process_single_row, row_data): row_data for row_data in batch}
+        if self.csv_path:
+            self._open_csv()
+        
+        try:
+            for batch_num in range(0, len(unique_rows), batch_size):
+                batch = unique_rows[batch_num:batch_num + batch_size]
+                current_batch = batch_num // batch_size + 1
                 
-                for future in as_completed(future_to_row):
-                    row_data = future_to_row[future]
-                    row_idx = row_data[0]
+                print(f"\n📦 Batch {current_batch}/{total_batches} ({len(batch)} rows)")
+                print("-" * 60)
+                
+                with ThreadPoolExecutor(max_workers=batch_size) as executor:
+                    future_to_rows = {executor.submit(self.process_single_row, rows[0]): rows for rows in batch}
                     
-                    try:
-                        result_row_idx, result, error = future.result()
+                    for future in as_completed(future_to_rows):
+                        rows = future_to_rows[future]
+                        row_idx = rows[0][0]
                         
-                        if result:
-                            self.processor.save_to_excel(result)
-                            processed += 1
-                            print(f"  ✓ Row {result_row_idx} - {processed}/{len(rows_data)}")
-                        elif error == "Empty":
-                            skipped += 1
-                        else:
-                            failed += 1
-                            if error != "Failed":
-                                print(f"  ✗ Row {result_row_idx}: {error[:50]}")
-                    
-                    except Exception as e:
-                        failed += 1
-                        print(f"  ✗ Row {row_idx}: {str(e)[:50]}")
-            
-            # Delay between batches
-            if current_batch < total_batches:
-                print(f"⏸️  Waiting 3s before next batch...")
-                time.sleep(3)
+                        try:
+                            result_row_idx, result, error = future.result()
+                            
+                            if result:
+                                # Duplicates reuse the result under their own audio name
+                                for dup_row_idx, audio_name, _ in rows:
+                                    self._record(dict(result, audio_name=audio_name or ''))
+                                    processed += 1
+                                    print(f"  ✓ Row {dup_row_idx} - {processed}/{len(rows_data)}")
+                            elif error == "Empty":
+                                skipped += len(rows)
+                            else:
+                                failed += len(rows)
+                                if error != "Failed":
+                                    print(f"  ✗ Row {result_row_idx}: {error[:50]}")
+                        
+                        except Exception as e:
+                            failed += len(rows)
+                            print(f"  ✗ Row {row_idx}: {str(e)[:50]}")
+                
+                # Delay between batches
+                if current_batch < total_batches:
+                    print(f"⏸️  Waiting 3s before next batch...")
+                    time.sleep(3)
+        finally:
+            # Write whatever is still buffered, even if the run is interrupted
+            if self._csv_file is not None:
+                self._csv_file.close()
+                self._csv_file = self._csv_writer = None
+            self.processor.flush_excel()
+        
+        self.processor.intent_analyzer.save_cache()
+        self.processor.llm_cache.report()
         
         # Summary
         elapsed_time = time.time() - start_time
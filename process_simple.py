@@ -1,31 +1,53 @@
 """
-Simple Sequential Processing with Progress
-Processes one row at a time with clear progress output
-Most reliable - no rate limit issues
+Simple Processing with Progress
+Processes rows with a few concurrent workers and clear progress output
+Rate limited by a shared token bucket - no rate limit issues
 """
 
 import os
+import queue
 import sys
+import threading
 import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from process_transcribe_to_excel import TranscribeProcessor
-from openpyxl import load_workbook
+# Per-row detail (headers, text preview, summary - including the processor's
+# own per-row lines) is only printed with VERBOSE=1; otherwise a progress line
+# is printed every PROGRESS_EVERY rows
+VERBOSE = os.getenv('VERBOSE', '0') == '1'
+PROGRESS_EVERY = 25
 
+from process_transcribe_to_excel import TranscribeProcessor, iter_source_rows
+from process_bulk_optimized import TokenBucket
 
-def process_excel_simple(source_file, limit=20, start_row=2):
+
+def process_excel_simple(source_file, limit=20, start_row=2, concurrency=4, requests_per_second=2.0,
+                         max_requests_per_second=10.0):
     """
-    Simple sequential processing with clear progress
+    Simple processing with clear progress
+    
+    Rows flow through a bounded pipeline: a reader thread streams them from
+    the source sheet, `concurrency` worker threads call the LLM and this
+    thread appends the results to the workbook in source order (results that
+    finish early wait in a reorder buffer). Both queues hold at most
+    2*concurrency items and at most 4*concurrency rows are read but not yet
+    written, so a slow stage blocks the one feeding it instead of rows piling
+    up in memory. A shared token bucket paces the workers adaptively (AIMD): the rate starts at `requests_per_second`,
+    grows on every success up to `max_requests_per_second` and is halved when
+    the API reports a rate limit, so no manual tuning is needed.
     
     Args:
         source_file: Source Excel file
         limit: Number of rows to process
         start_row: Starting row number (default: 2, skip header)
+        concurrency: Rows processed at the same time
+        requests_per_second: Starting rate (rows started per second)
+        max_requests_per_second: Upper bound for the adaptive rate
     """
     print("="*60, flush=True)
-    print("SIMPLE SEQUENTIAL PROCESSING", flush=True)
+    print("SIMPLE PROCESSING", flush=True)
     print("="*60, flush=True)
     
     # Get API key
@@ -42,7 +64,7 @@ def process_excel_simple(source_file, limit=20, start_row=2):
     print(f"\n📖 Source: {source_file}", flush=True)
     print(f"💾 Output: IntentOfthetranscribetext.xlsx", flush=True)
     print(f"📊 Processing {limit} rows starting from row {start_row}", flush=True)
-    print(f"⏱️  Delay: 2 seconds between rows", flush=True)
+    print(f"⏱️  {concurrency} concurrent rows, {requests_per_second}-{max_requests_per_second} rows/s (adaptive)", flush=True)
     print("="*60 + "\n", flush=True)
     
     # Initialize processor
@@ -51,15 +73,15 @@ def process_excel_simple(source_file, limit=20, start_row=2):
         excel_file='IntentOfthetranscribetext.xlsx',
         llm_model='sarvam-m',
         language='hindi',
-        api_key=api_key
+        api_key=api_key,
+        verbose=VERBOSE
     )
+    bucket = TokenBucket(rate=requests_per_second, capacity=max(1.0, requests_per_second),
+                         max_rate=max_requests_per_second)
     
-    # Read source file
-    print(f"\nReading {source_file}...", flush=True)
-    wb = load_workbook(source_file, read_only=True)
-    ws = wb.active
-    total_rows = ws.max_row
-    print(f"Total rows in file: {total_rows}", flush=True)
+    # Rows are streamed from the source file by the reader thread below
+    total = limit
+    print(f"\nStreaming up to {total} rows from {source_file}...", flush=True)
     
     # Process rows
     processed = 0
@@ -67,71 +89,113 @@ def process_excel_simple(source_file, limit=20, start_row=2):
     skipped = 0
     start_time = time.time()
     
-    end_row = min(start_row + limit, total_rows + 1)
+    in_q = queue.Queue(maxsize=2 * concurrency)
+    out_q = queue.Queue(maxsize=2 * concurrency)
+    # Rows read but not yet written; bounds the reorder buffer when one row is slow
+    window = threading.Semaphore(4 * concurrency)
+    
+    def reader():
+        try:
+            for row in iter_source_rows(source_file, limit, start_row=start_row):
+                window.acquire()
+                in_q.put(row)
+        finally:
+            # One end marker per worker
+            for _ in range(concurrency):
+                in_q.put(None)
+    
+    def worker():
+        while True:
+            item = in_q.get()
+            if item is None:
+                out_q.put(None)
+                return
+            row_idx, audio_name, transcribed_text = item
+            transcribed_text = str(transcribed_text).strip() if transcribed_text is not None else ''
+            # Empty rows are passed through so the writer can count them
+            if not transcribed_text:
+                out_q.put((row_idx, audio_name, '', None, None))
+                continue
+            try:
+                bucket.take()
+                result = processor.process_text(transcribed_text, audio_name)
+                bucket.record(result)
+                out_q.put((row_idx, audio_name, transcribed_text, result, None))
+            except Exception as e:
+                out_q.put((row_idx, audio_name, transcribed_text, None, e))
     
     print(f"\nStarting processing...\n", flush=True)
     
-    for row_idx in range(start_row, end_row):
-        current = row_idx - start_row + 1
-        total = end_row - start_row
+    threads = [threading.Thread(target=reader, name='reader', daemon=True)]
+    threads += [threading.Thread(target=worker, name=f'worker-{i}', daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    
+    # Writer: drain results until every worker has finished, writing them in
+    # source order so output rows line up with the source sheet
+    workers_done = 0
+    finished = {}
+    next_row = start_row
+    while workers_done < concurrency or next_row in finished:
+        if next_row not in finished:
+            item = out_q.get()
+            if item is None:
+                workers_done += 1
+            else:
+                finished[item[0]] = item
+            continue
         
-        print(f"{'='*60}", flush=True)
-        print(f"[{current}/{total}] Processing Row {row_idx}", flush=True)
-        print(f"{'='*60}", flush=True)
+        row_idx, audio_name, transcribed_text, result, error = finished.pop(next_row)
+        next_row += 1
+        window.release()
+        if not transcribed_text:
+            if VERBOSE:
+                print(f"⊘ Row {row_idx} skipped (empty transcription)", flush=True)
+            skipped += 1
+            processor.mark_source_row(row_idx)
+            continue
         
-        try:
-            # Get data
-            audio_name = ws.cell(row=row_idx, column=1).value
-            transcribed_text = ws.cell(row=row_idx, column=2).value
-            
-            # Skip empty
-            if not transcribed_text or not str(transcribed_text).strip():
-                print(f"⊘ Skipped (empty transcription)\n", flush=True)
-                skipped += 1
-                continue
-            
-            transcribed_text = str(transcribed_text).strip()
-            
-            # Show preview
+        if error is not None:
+            failed += 1
+            processor.mark_source_row(row_idx)
+        elif result:
+            processor.save_to_excel(result, source_row=row_idx)
+            processed += 1
+        else:
+            failed += 1
+            processor.mark_source_row(row_idx)
+        current = processed + failed + skipped
+        
+        if VERBOSE:
             preview = transcribed_text[:60] + "..." if len(transcribed_text) > 60 else transcribed_text
-            print(f"Text: {preview}", flush=True)
+            lines = [f"{'='*60}", f"[{current}/{total}] Row {row_idx}", f"{'='*60}", f"Text: {preview}"]
             if audio_name:
-                print(f"Audio: {audio_name}", flush=True)
-            
-            # Process
-            print("Processing...", flush=True)
-            result = processor.process_text(transcribed_text, audio_name)
-            
-            if result:
-                # Save
-                processor.save_to_excel(result)
-                processed += 1
-                print(f"✓ Success!", flush=True)
-                print(f"  Summary: {result['summary'][:50]}...", flush=True)
-                print(f"  Intent: {result['intent']}", flush=True)
+                lines.append(f"Audio: {audio_name}")
+            if error is not None:
+                lines.append(f"✗ Error: {str(error)[:100]}")
+            elif result:
+                lines += ["✓ Success!", f"  Summary: {result['summary'][:50]}...", f"  Intent: {result['intent']}"]
             else:
-                failed += 1
-                print(f"✗ Failed to process", flush=True)
-            
-        except Exception as e:
-            failed += 1
-            print(f"✗ Error: {str(e)[:100]}", flush=True)
+                lines.append("✗ Failed to process")
+        elif current % PROGRESS_EVERY == 0:
+            lines = []
+        else:
+            continue
         
         # Progress summary
         elapsed = time.time() - start_time
         rate = processed / elapsed if elapsed > 0 else 0
-        remaining = total - current
+        remaining = max(0, total - current)
         eta = remaining / rate if rate > 0 else 0
         
-        print(f"\n📊 Progress: {processed} processed, {failed} failed, {skipped} skipped", flush=True)
-        print(f"⏱️  Time: {elapsed:.0f}s | Speed: {rate:.2f} rows/s | ETA: {eta:.0f}s", flush=True)
-        
-        # Delay between rows
-        if current < total:
-            print(f"⏸️  Waiting 2 seconds...\n", flush=True)
-            time.sleep(2)
+        lines.append(f"\n📊 Progress: {current}/{total} | {processed} processed, {failed} failed, {skipped} skipped")
+        lines.append(f"⏱️  Time: {elapsed:.0f}s | Speed: {rate:.2f} rows/s | ETA: {eta:.0f}s\n")
+        # One write per row instead of one flushed print per line
+        print("\n".join(lines), flush=True)
     
-    wb.close()
+    processor.flush_excel()
+    processor.intent_analyzer.save_cache()
+    processor.llm_cache.report()
     
     # Final summary
     elapsed_time = time.time() - start_time
@@ -152,8 +216,10 @@ if __name__ == "__main__":
     source_file = sys.argv[1] if len(sys.argv) > 1 else 'Transcript-24-11-2025.xlsx'
     limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10  # Default: 10 rows
     start_row = int(sys.argv[3]) if len(sys.argv) > 3 else 2  # Default: start at row 2
+    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 4  # Default: 4 rows at a time
     
-    print("\n📋 Usage: python process_simple.py [source_file] [limit] [start_row]", flush=True)
-    print("📋 Example: python process_simple.py Transcript-24-11-2025.xlsx 50 2\n", flush=True)
+    print("\n📋 Usage: python process_simple.py [source_file] [limit] [start_row] [concurrency]", flush=True)
+    print("📋 Example: python process_simple.py Transcript-24-11-2025.xlsx 50 2 4", flush=True)
+    print("📋 Set VERBOSE=1 for per-row details\n", flush=True)
     
-    process_excel_simple(source_file, limit, start_row)
+    process_excel_simple(source_file, limit, start_row, concurrency)
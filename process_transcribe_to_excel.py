@@ -4,8 +4,15 @@ Takes transcribed text, processes through LLM, extracts keywords and intent,
 and saves to Excel file with columns: transcribe, llm response, keywords, intent
 """
 
+import atexit
+import hashlib
+import json
 import os
+import re
+import sqlite3
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Try to load from .env file
 try:
@@ -18,13 +25,289 @@ except Exception:
 
 from llm_module import LLMModule
 from intent_analyzer import IntentAnalyzer
+from check_progress import read_checkpoint
 from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
 from datetime import datetime
 
+# Try to import numpy for vectorized script detection
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# Try to import python-calamine (Rust XLSX reader) for the read path
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+    CalamineWorkbook = None
+
+# Try to import numba for a compiled script-counting loop
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = NUMPY_AVAILABLE
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _count_scripts_kernel(cp, lut):
+        """Script/alnum counts for BMP codepoints; also returns how many were outside the BMP"""
+        telugu = hindi = urdu = english = alnum = other = 0
+        for c in cp:
+            if c >= 0x10000:
+                other += 1
+                continue
+            v = lut[c]
+            script = v & 7
+            if script == 1:
+                telugu += 1
+            elif script == 2:
+                hindi += 1
+            elif script == 3:
+                urdu += 1
+            elif script == 4:
+                english += 1
+            alnum += v >> 3
+        return telugu, hindi, urdu, english, alnum, other
+
+
+# Per-BMP-codepoint class byte, built on first use (see _count_scripts):
+# low bits = script (0 other, 1 Telugu, 2 Devanagari, 3 Arabic, 4 ASCII letter),
+# bit 3 = str.isalnum
+_LANG_LUT = None
+
+
+def _build_lang_lut():
+    lut = np.array([chr(i).isalnum() for i in range(0x10000)], dtype=np.uint8) << 3
+    lut[0x0C00:0x0C80] |= 1
+    lut[0x0900:0x0980] |= 2
+    lut[0x0600:0x0700] |= 3
+    lut[65:91] |= 4
+    lut[97:123] |= 4
+    return lut
+
+
+def _count_scripts(text):
+    """
+    Count Telugu, Devanagari, Arabic-script and ASCII-letter characters, plus
+    alphanumerics, in one pass over the codepoints
+    
+    Returns:
+        (telugu, hindi, urdu, english, alnum) character counts
+    """
+    if not NUMPY_AVAILABLE:
+        return (sum(1 for c in text if '\u0C00' <= c <= '\u0C7F'),
+                sum(1 for c in text if '\u0900' <= c <= '\u097F'),
+                sum(1 for c in text if '\u0600' <= c <= '\u06FF'),
+                sum(1 for c in text if c.isalpha() and ord(c) < 128),
+                sum(1 for c in text if c.isalnum()))
+    
+    global _LANG_LUT
+    if _LANG_LUT is None:
+        _LANG_LUT = _build_lang_lut()
+    
+    cp = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    
+    if NUMBA_AVAILABLE:
+        # One compiled loop, no temporary arrays
+        telugu, hindi, urdu, english, alnum, other = _count_scripts_kernel(cp, _LANG_LUT)
+        if other:
+            alnum += sum(1 for c in cp[cp >= 0x10000] if chr(c).isalnum())
+        return int(telugu), int(hindi), int(urdu), int(english), int(alnum)
+    
+    # One table gather + one bincount classifies every codepoint
+    in_bmp = cp < 0x10000
+    counts = np.bincount(_LANG_LUT[cp[in_bmp]], minlength=16)
+    scripts = counts[:8] + counts[8:]
+    alnum = int(counts[8:].sum())
+    
+    # Non-BMP characters (rare) belong to none of the scripts; only alnum matters
+    if not in_bmp.all():
+        alnum += sum(1 for c in cp[~in_bmp] if chr(c).isalnum())
+    
+    return int(scripts[1]), int(scripts[2]), int(scripts[3]), int(scripts[4]), alnum
+
+
+# Static parts of the summary prompt (the row text goes in between)
+_SUMMARY_PREFIX = "Summarize the following text in English in one sentence describing the main point:\n\n"
+_SUMMARY_SUFFIX = "\n\nExample format: 'complain for unavailability of current'"
+
+# One-call prompt returning both columns, so each row costs a single round trip
+_FUSED_SYSTEM_PROMPT = (
+    "You summarize customer call transcripts. Reply with ONLY a JSON object: "
+    '{"summary": "<one English sentence describing the main point>", '
+    '"intent": "<2-3 English words>"}'
+)
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+_WS_RE = re.compile(r'\s+')
+
+
+def _parse_fused(response):
+    """
+    Parse a fused summary+intent reply
+    
+    Args:
+        response: Raw LLM reply
+    
+    Returns:
+        (summary, intent) tuple, or None if the reply is an error or malformed
+    """
+    if not response or response.startswith('Error generating response'):
+        return None
+    match = _JSON_OBJECT_RE.search(response)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    summary = str(data.get('summary') or '').strip()
+    intent = str(data.get('intent') or '').strip()
+    if not summary:
+        return None
+    return summary, intent
+
+
+# Cell styles for result and header rows (styles are immutable, so one instance each is shared)
+_WRAP_ALIGNMENT = Alignment(wrap_text=True, vertical="top")
+_HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+_HEADER_FONT = Font(bold=True, color="FFFFFF", size=12)
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+
+def iter_source_rows(source_excel_file, limit, audio_col=1, transcribe_col=2, start_row=2):
+    """
+    Yield (row_idx, audio_name, transcribed_text) tuples from a source sheet
+    
+    Uses python-calamine when installed, otherwise streams rows with openpyxl
+    in read-only mode so the caller can start work before the sheet is read.
+    
+    Args:
+        source_excel_file: Excel file with transcriptions (first sheet, header in row 1)
+        limit: Maximum number of data rows to read
+        audio_col: Column number for audio name (1-indexed)
+        transcribe_col: Column number for transcribed text (1-indexed)
+        start_row: First Excel row to read (default: 2, skip header)
+    
+    Yields:
+        (row_idx, audio_name, transcribed_text), row_idx being the Excel row number
+    """
+    max_col = max(audio_col, transcribe_col)
+    
+    if CALAMINE_AVAILABLE:
+        ws = CalamineWorkbook.from_path(source_excel_file).get_sheet_by_index(0)
+        rows = ws.to_python(skip_empty_area=False)[start_row - 1:start_row - 1 + limit]
+        for row_idx, row in enumerate(rows, start=start_row):
+            row = list(row) + [None] * (max_col - len(row))
+            yield row_idx, row[audio_col - 1], row[transcribe_col - 1]
+        return
+    
+    wb = load_workbook(source_excel_file, read_only=True, data_only=True)
+    try:
+        for row_idx, row in enumerate(
+                wb.active.iter_rows(min_row=start_row, max_row=start_row + limit - 1, max_col=max_col, values_only=True),
+                start=start_row):
+            yield row_idx, row[audio_col - 1], row[transcribe_col - 1]
+    finally:
+        wb.close()
+
+
+def read_source_rows(source_excel_file, limit, audio_col=1, transcribe_col=2, start_row=2):
+    """
+    Read (row_idx, audio_name, transcribed_text) tuples from a source sheet
+    
+    Args:
+        Same as iter_source_rows
+    
+    Returns:
+        List of (row_idx, audio_name, transcribed_text), row_idx being the Excel row number
+    """
+    return list(iter_source_rows(source_excel_file, limit, audio_col, transcribe_col, start_row))
+
+
+def group_duplicate_rows(rows_data):
+    """
+    Group rows with identical transcriptions so each text is sent to the API once
+    
+    Args:
+        rows_data: List of (row_idx, audio_name, transcribed_text)
+    
+    Returns:
+        (groups, empty_rows): groups maps normalized text to its rows (in sheet
+        order, the first one being processed); empty_rows have no text at all
+    """
+    groups = {}
+    empty_rows = []
+    for row in rows_data:
+        key = str(row[2]).strip().lower() if row[2] is not None else ''
+        if key:
+            groups.setdefault(key, []).append(row)
+        else:
+            empty_rows.append(row)
+    return groups, empty_rows
+
+
+class LLMCache:
+    def __init__(self, path):
+        """
+        Persistent (summary, intent) cache keyed by a hash of model, language and text
+        
+        Backed by SQLite in WAL mode, so every stored result survives a crash and
+        reruns after failures don't pay for rows that already succeeded.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS llm_cache (key BLOB PRIMARY KEY, summary TEXT, intent TEXT)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(model, language, text):
+        """Hash of model, language and whitespace/case-normalized text"""
+        normalized = ' '.join(text.split()).lower()
+        return hashlib.sha256(f"{model}|{language}|{normalized}".encode('utf-8')).digest()
+    
+    def get(self, key):
+        """Return (summary, intent) or None"""
+        with self._lock:
+            row = self._conn.execute('SELECT summary, intent FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row
+    
+    def set(self, key, summary, intent):
+        """Store a result"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO llm_cache (key, summary, intent) VALUES (?, ?, ?)',
+                               (key, summary, intent))
+            self._conn.commit()
+    
+    def report(self):
+        """Print hit/miss statistics"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        print(f"LLM cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)")
+
 
 class TranscribeProcessor:
-    def __init__(self, excel_file='IntentOfthetranscribetext.xlsx', llm_model='openhathi-hi', language='hindi', api_key=None):
+    def __init__(self, excel_file='IntentOfthetranscribetext.xlsx', llm_model='openhathi-hi', language='hindi', api_key=None, session=None,
+                 verbose=True):
         """
         Initialize Transcribe Processor
         
@@ -35,18 +318,25 @@ class TranscribeProcessor:
                 - 'openhathi-en' (English)
             language: Language for analysis ('hindi', 'english', 'urdu', 'telugu')
             api_key: Sarvam AI API key (if None, reads from SARVAM_API_KEY env var)
+            session: requests.Session for all LLM calls (default: the shared keep-alive
+                session in llm_module, so every call reuses the same TLS connections)
+            verbose: Print per-row progress from process_text (bulk runs turn this
+                off; warnings are always printed)
         """
         self.excel_file = excel_file
+        self.verbose = verbose
         self.language = language.lower()
         
         print("Initializing LLM module with Sarvam AI...")
         # Use Sarvam's multilingual model (supports Hindi, English, and other Indian languages)
         model = llm_model or 'sarvam-m'
         
-        self.llm = LLMModule(model_name=model, api_key=api_key)
+        self.llm = LLMModule(model_name=model, api_key=api_key, session=session)
         
         print("Initializing Intent Analyzer...")
-        self.intent_analyzer = IntentAnalyzer(llm_model=model, api_key=api_key)
+        # Intent cache is persisted beside the Excel file so reruns/resumes start warm
+        intent_cache_path = os.path.splitext(self.excel_file)[0] + '_intent_cache.pkl'
+        self.intent_analyzer = IntentAnalyzer(cache_path=intent_cache_path, llm_module=self.llm)
         
         # System prompts for LLM summary generation
         self.system_prompts = {
@@ -56,8 +346,53 @@ class TranscribeProcessor:
             'telugu': 'మీరు ఒక తెలివైన విశ్లేషకుడు. ఇచ్చిన టెక్స్ట్‌కు సంక్షిప్తమైన మరియు ఖచ్చితమైన సారాంశం అందించండి. సారాంశం ఇంగ్లీష్‌లో ఉండాలి మరియు ముఖ్యమైన అంశాన్ని ఒక వాక్యంలో వివరించండి.'
         }
         
+        # Build the script lookup table (and compile the numba loop) now rather
+        # than on the first row
+        _count_scripts('a')
+        
+        # Summaries are always generated in English
+        self._english_system_prompt = self.system_prompts['english']
+        
+        # Longer transcripts are cut to this many characters before prompting
+        self.max_prompt_chars = int(os.getenv('MAX_PROMPT_CHARS', '2048'))
+        
+        # Fused summary+intent calls are dropped after this many unparseable
+        # replies in a row; the two separate calls then run concurrently
+        self.max_fused_failures = 3
+        self._fused_failures = 0
+        self._intent_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='intent')
+        
+        # (summary, intent) results persisted beside the Excel file
+        self.llm_cache = LLMCache(os.path.splitext(self.excel_file)[0] + '_llm_cache.sqlite')
+        
+        # Output workbook stays open for the whole run and rows are appended in
+        # memory. Saving an XLSX rewrites the whole zip, so rows are appended to
+        # a JSONL journal every `save_every` rows and the workbook itself is only
+        # rewritten every `workbook_every` rows and by flush_excel() (also run at
+        # exit). A crashed run's journal is merged into the workbook on the next
+        # start. A new file is built as a write-only (streaming) workbook.
+        self._wb = None
+        self._ws = None
+        self._write_only = False
+        self._journal_path = os.path.splitext(self.excel_file)[0] + '_pending.jsonl'
+        self._journal_rows = []
+        self._unsaved = 0
+        self._dirty = False
+        # {"rows", "next_source_row"} rewritten on every save so resume_processing
+        # doesn't have to open the output workbook. next_source_row is the first
+        # source row not yet finished, as reported by the caller (save_to_excel /
+        # mark_source_row); it is null once rows are saved without a source row.
+        self._checkpoint_path = os.path.splitext(self.excel_file)[0] + '_checkpoint.json'
+        self._rows = 0
+        self._next_source_row = read_checkpoint(self.excel_file)
+        self.save_every = 25
+        self.workbook_every = 500
+        self._rows_since_write = 0
+        self._excel_lock = threading.Lock()
+        
         # Initialize Excel file
         self._init_excel_file()
+        atexit.register(self.flush_excel)
         
         print("Transcribe Processor initialized successfully!")
     
@@ -77,12 +412,7 @@ class TranscribeProcessor:
         text = str(text).strip()
         
         # Count characters for each script
-        telugu_chars = sum(1 for c in text if '\u0C00' <= c <= '\u0C7F')
-        hindi_chars = sum(1 for c in text if '\u0900' <= c <= '\u097F')
-        urdu_chars = sum(1 for c in text if '\u0600' <= c <= '\u06FF')
-        english_chars = sum(1 for c in text if c.isalpha() and ord(c) < 128)
-        
-        total_chars = len([c for c in text if c.isalnum()])
+        telugu_chars, hindi_chars, urdu_chars, english_chars, total_chars = _count_scripts(text)
         
         if total_chars == 0:
             return self.language  # Return default if no alphanumeric chars
@@ -123,29 +453,69 @@ class TranscribeProcessor:
                     print(f"Created headers in existing Excel file: {self.excel_file}")
                 else:
                     print(f"Using existing Excel file: {self.excel_file}")
+                self._wb, self._ws = wb, ws
+                self._rows = max(0, ws.max_row - 1)
             except Exception as e:
                 print(f"Error reading Excel file: {e}. Creating new file...")
                 self._create_new_excel()
         else:
             self._create_new_excel()
+        
+        self._recover_journal()
     
     def _create_new_excel(self):
-        """Create a new Excel file with headers"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Transcriptions"
-        self._create_headers(ws)
-        wb.save(self.excel_file)
+        """Create a new write-only Excel workbook with headers (written on the first flush)"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Transcriptions")
+        self._create_headers(ws, write_only=True)
         print(f"Created new Excel file: {self.excel_file}")
+        self._wb, self._ws = wb, ws
+        self._write_only = True
     
-    def _create_headers(self, ws):
+    def _recover_journal(self):
+        """Merge rows journaled by a run that stopped before writing its workbook"""
+        if not os.path.exists(self._journal_path):
+            return
+        
+        with open(self._journal_path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        print(f"Recovering {len(rows)} unsaved rows from {self._journal_path}")
+        
+        for values in rows:
+            self._append_values(values)
+        # Already in the journal, which is removed once the workbook is written
+        self._unsaved = 0
+        self._write_workbook()
+    
+    def _create_headers(self, ws, write_only=False):
         """Create column headers with styling"""
         headers = ['Audio Name', 'Transcribe', 'Summary', 'Intent']
         
+        # Set column widths
+        ws.column_dimensions['A'].width = 40  # Audio Name
+        ws.column_dimensions['B'].width = 50  # Transcribe
+        ws.column_dimensions['C'].width = 50  # Summary
+        ws.column_dimensions['D'].width = 30  # Intent
+        
+        # Freeze header row
+        ws.freeze_panes = 'A2'
+        
         # Header style
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        header_alignment = Alignment(horizontal="center", vertical="center")
+        header_fill = _HEADER_FILL
+        header_font = _HEADER_FONT
+        header_alignment = _HEADER_ALIGNMENT
+        
+        if write_only:
+            # Write-only sheets only take whole rows, styled through WriteOnlyCell
+            cells = []
+            for header in headers:
+                cell = WriteOnlyCell(ws, value=header)
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.alignment = header_alignment
+                cells.append(cell)
+            ws.append(cells)
+            return
         
         for col_idx, header in enumerate(headers, start=1):
             cell = ws.cell(row=1, column=col_idx)
@@ -153,15 +523,23 @@ class TranscribeProcessor:
             cell.fill = header_fill
             cell.font = header_font
             cell.alignment = header_alignment
+    
+    def _fused_prompt(self, text):
+        """
+        Build the single-call prompt asking for summary and intent as JSON
         
-        # Set column widths
-        ws.column_dimensions['A'].width = 40  # Audio Name
-        ws.column_dimensions['B'].width = 50  # Transcribe
-        ws.column_dimensions['C'].width = 50  # Summary
-        ws.column_dimensions['D'].width = 30  # Intent
+        Args:
+            text: Transcribed text
         
-        # Freeze header row
-        ws.freeze_panes = 'A2'
+        Returns:
+            Prompt string
+        """
+        return (
+            "Summarize the following text in English in one sentence describing the main point, "
+            "and identify the user's intent in 2-3 English words.\n\n"
+            f"Text: {text}\n\n"
+            'Example: {"summary": "complain for unavailability of current", "intent": "power outage complaint"}\n\nJSON:'
+        )
     
     def process_text(self, transcribed_text, audio_name=None):
         """
@@ -180,40 +558,107 @@ class TranscribeProcessor:
         # Auto-detect language from text
         detected_language = self._detect_language_from_text(transcribed_text)
         if detected_language != self.language:
-            print(f"Language detected: {detected_language.upper()} (was using {self.language.upper()})")
+            if self.verbose:
+                print(f"Language detected: {detected_language.upper()} (was using {self.language.upper()})")
             processing_language = detected_language
         else:
             processing_language = self.language
         
-        text_preview = transcribed_text[:50] if len(transcribed_text) > 50 else transcribed_text
-        print(f"\nProcessing: {text_preview}...")
-        if audio_name:
-            print(f"Audio Name: {audio_name}")
-        print(f"Using language: {processing_language.upper()}")
-        
-        # Step 1: Get LLM summary (always in English as per requirement)
-        print("Generating summary with LLM...")
-        # Use English system prompt for summary (always in English)
-        system_prompt = self.system_prompts.get('english', self.system_prompts['english'])
-        
-        # Create prompt for summary (always in English as per requirement)
-        summary_prompt = f"Summarize the following text in English in one sentence describing the main point:\n\n{transcribed_text}\n\nExample format: 'complain for unavailability of current'"
-        
-        summary = self.llm.generate(
-            prompt=summary_prompt,
-            system_prompt=system_prompt,
-            max_tokens=100,  # Shorter for summary
-            temperature=0.3  # Lower temperature for more focused summary
-        )
+        if self.verbose:
+            text_preview = transcribed_text[:50] if len(transcribed_text) > 50 else transcribed_text
+            print(f"\nProcessing: {text_preview}...")
+            if audio_name:
+                print(f"Audio Name: {audio_name}")
+            print(f"Using language: {processing_language.upper()}")
+        
+        # Identical text (same model/language) was processed before: reuse it
+        cache_key = LLMCache.make_key(self.llm.model_name, processing_language, transcribed_text)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            summary, intent = cached
+            if self.verbose:
+                print(f"Summary (cached): {summary[:50]}...")
+                print(f"Intent (cached): {intent if intent else 'N/A'}")
+            return {
+                'audio_name': audio_name or '',
+                'transcribe': transcribed_text,
+                'summary': summary,
+                'intent': intent
+            }
+        
+        # The LLM only sees collapsed whitespace, capped at max_prompt_chars
+        # (prompt tokens drive both latency and cost)
+        prompt_text = _WS_RE.sub(' ', transcribed_text).strip()
+        if len(prompt_text) > self.max_prompt_chars:
+            if self.verbose:
+                print(f"Text truncated from {len(prompt_text)} to {self.max_prompt_chars} characters for the LLM")
+            prompt_text = prompt_text[:self.max_prompt_chars]
+        
+        # Summary and intent come from one round trip when possible; the
+        # separate intent call is only used when the intent is already cached
+        # or the fused reply can't be parsed
+        cached_intent = self.intent_analyzer.lookup(prompt_text)
+        summary = None
+        analysis = None
+        if cached_intent is None and self._fused_failures < self.max_fused_failures:
+            if self.verbose:
+                print("Generating summary and intent with LLM...")
+            fused = self.llm.generate(
+                prompt=self._fused_prompt(prompt_text),
+                system_prompt=_FUSED_SYSTEM_PROMPT,
+                max_tokens=150,
+                temperature=0.3
+            )
+            parsed = _parse_fused(fused)
+            if parsed is not None:
+                summary, intent = parsed
+                analysis = {'intent': intent}
+                self.intent_analyzer.remember(prompt_text, intent)
+                self._fused_failures = 0
+            else:
+                print("[WARNING] Fused reply not parseable, falling back to separate calls")
+                if not fused.startswith('Error generating response'):
+                    self._fused_failures += 1
+                    if self._fused_failures == self.max_fused_failures:
+                        print("[WARNING] Model doesn't return the fused JSON; using separate calls from now on")
+        elif cached_intent is not None:
+            analysis = {'intent': cached_intent}
+        
+        # Without a fused reply the summary and intent calls are independent,
+        # so the intent request runs while the summary request is in flight
+        intent_future = None
+        if analysis is None:
+            intent_future = self._intent_executor.submit(
+                self.intent_analyzer.analyze, prompt_text, language=processing_language)
+        
+        if summary is None:
+            # Step 1: Get LLM summary (always in English as per requirement)
+            if self.verbose:
+                print("Generating summary with LLM...")
+            # Use English system prompt for summary (always in English)
+            system_prompt = self._english_system_prompt
+            
+            # Create prompt for summary (always in English as per requirement)
+            summary_prompt = _SUMMARY_PREFIX + prompt_text + _SUMMARY_SUFFIX
+            
+            summary = self.llm.generate(
+                prompt=summary_prompt,
+                system_prompt=system_prompt,
+                max_tokens=100,  # Shorter for summary
+                temperature=0.3  # Lower temperature for more focused summary
+            )
         summary = summary.strip()
         # Clean up summary - remove quotes if present
         summary = summary.strip('"\'')
-        summary_preview = summary[:50] if len(summary) > 50 else summary
-        print(f"Summary: {summary_preview}...")
+        if self.verbose:
+            summary_preview = summary[:50] if len(summary) > 50 else summary
+            print(f"Summary: {summary_preview}...")
         
         # Step 2: Analyze for intent only (keywords removed)
-        print("Extracting intent...")
-        analysis = self.intent_analyzer.analyze(transcribed_text, language=processing_language)
+        if intent_future is not None:
+            if self.verbose:
+                print("Extracting intent...")
+            analysis = intent_future.result()
         
         intent = analysis.get('intent', '')
         # Ensure intent is clean and short
@@ -224,7 +669,14 @@ class TranscribeProcessor:
                 intent = ' '.join(words[:3])
             intent = intent.strip().lower()
         
-        print(f"Intent: {intent if intent else 'N/A'}")
+        if self.verbose:
+            print(f"Intent: {intent if intent else 'N/A'}")
+        
+        # Summary is generated at temperature 0.3, so it's stable enough to reuse;
+        # LLMModule returns error text instead of raising - don't cache those, and
+        # don't cache a row whose separate intent call failed (reruns retry it)
+        if not summary.startswith('Error generating response') and not analysis.get('error'):
+            self.llm_cache.set(cache_key, summary, intent)
         
         return {
             'audio_name': audio_name or '',
@@ -233,43 +685,160 @@ class TranscribeProcessor:
             'intent': intent
         }
     
-    def save_to_excel(self, result):
+    def save_to_excel(self, result, source_row=None):
         """
         Save result to Excel file
         
+        The row is appended to the open workbook and journaled every
+        `save_every` rows; the Excel file itself is rewritten every
+        `workbook_every` rows and by flush_excel() (also run at exit).
+        
         Args:
             result: Dictionary with audio_name, transcribe, summary, intent
+            source_row: Source sheet row the result came from. Callers that pass it
+                        must save (or mark_source_row) source rows in order; it is
+                        what the checkpoint records for resume_processing.
         """
         if not result:
             print("No result to save")
             return
         
+        with self._excel_lock:
+            self._append_row(result, source_row)
+            if self._unsaved >= self.save_every:
+                self._save()
+    
+    def mark_source_row(self, source_row):
+        """
+        Record a source row that finished without a saved result (empty or failed)
+        
+        Args:
+            source_row: Source sheet row number
+        """
+        with self._excel_lock:
+            self._next_source_row = source_row + 1
+    
+    def save_many_to_excel(self, results):
+        """
+        Append several results and save the file once
+        
+        Args:
+            results: List of dictionaries with audio_name, transcribe, summary, intent
+        """
+        if not results:
+            return
+        
+        with self._excel_lock:
+            for result in results:
+                self._append_row(result)
+            self._flush()
+    
+    def queue_for_excel(self, result, flush_every=50):
+        """
+        Append a result and save the rows once flush_every rows are unsaved
+        
+        Call flush_excel() when done to write the Excel file.
+        
+        Args:
+            result: Dictionary with audio_name, transcribe, summary, intent
+            flush_every: Number of unsaved rows that triggers a write
+        """
+        with self._excel_lock:
+            self._append_row(result)
+            if self._unsaved >= flush_every:
+                self._save()
+    
+    def flush_excel(self):
+        """Write all unsaved rows to the Excel file (also run at exit)"""
+        with self._excel_lock:
+            self._flush()
+    
+    def _flush(self):
+        """Write the workbook if it changed (caller holds _excel_lock)"""
+        if self._dirty or self._write_only:
+            self._write_workbook()
+        else:
+            # Trailing skipped/failed rows still move the resume position
+            self._write_checkpoint()
+    
+    def _write_workbook(self):
+        """Rewrite the Excel file with every row and drop the journal (caller holds _excel_lock)"""
         try:
-            wb = load_workbook(self.excel_file)
-            ws = wb.active
-            
-            # Find next empty row
-            next_row = ws.max_row + 1
-            
-            # Add data
-            ws.cell(row=next_row, column=1, value=result.get('audio_name', ''))
-            ws.cell(row=next_row, column=2, value=result['transcribe'])
-            ws.cell(row=next_row, column=3, value=result['summary'])
-            ws.cell(row=next_row, column=4, value=result['intent'])
-            
-            # Set text wrapping for better readability
-            for col in range(1, 5):
-                cell = ws.cell(row=next_row, column=col)
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-            
-            # Save file
-            wb.save(self.excel_file)
-            # Don't print success message for each row to reduce clutter
-            
+            self._wb.save(self.excel_file)
         except Exception as e:
+            # Rows stay in memory; journal them so a crash doesn't lose them
             print(f"[ERROR] Failed to save to Excel: {e}")
+            self._append_journal()
+            raise
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._journal_rows = []
+        self._unsaved = 0
+        self._rows_since_write = 0
+        self._dirty = False
+        self._write_checkpoint()
+        
+        # Any later rows go through a normal (re-opened) workbook
+        if self._write_only:
+            self._wb = load_workbook(self.excel_file)
+            self._ws = self._wb.active
+            self._write_only = False
+    
+    def _append_row(self, result, source_row=None):
+        """Append one result row to the open sheet (caller holds _excel_lock)"""
+        values = [result.get('audio_name', ''), result['transcribe'], result['summary'], result['intent']]
+        self._append_values(values)
+        self._journal_rows.append(values)
+        # A row without a source row makes the resume position unknown
+        self._next_source_row = source_row + 1 if source_row is not None else None
+    
+    def _append_values(self, values):
+        """Append a row of cell values with text wrapping for better readability"""
+        # Styled cells work for both workbook modes and avoid looking the row
+        # up again (ws.max_row scans every cell in a normal workbook)
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(self._ws, value=value)
+            cell.alignment = _WRAP_ALIGNMENT
+            cells.append(cell)
+        self._ws.append(cells)
+        self._unsaved += 1
+        self._rows += 1
+        self._rows_since_write += 1
+        self._dirty = True
+    
+    def _save(self):
+        """
+        Save unsaved rows (caller holds _excel_lock)
+        
+        Appending to the journal is O(rows written), so that is done every time;
+        the workbook is rewritten once `workbook_every` rows have piled up.
+        """
+        if self._rows_since_write >= self.workbook_every:
+            self._write_workbook()
+        else:
+            self._append_journal()
+    
+    def _append_journal(self):
+        """Append unsaved rows to the JSONL journal (caller holds _excel_lock)"""
+        try:
+            with open(self._journal_path, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(values, ensure_ascii=False) + '\n' for values in self._journal_rows)
+            self._journal_rows = []
+            self._unsaved = 0
+            self._write_checkpoint()
+            # Don't print success message for each row to reduce clutter
+        except Exception as e:
+            print(f"[ERROR] Failed to journal rows: {e}")
             raise
     
+    def _write_checkpoint(self):
+        """Atomically record how many rows are on disk (caller holds _excel_lock)"""
+        tmp_path = self._checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'rows': self._rows, 'next_source_row': self._next_source_row}, f)
+        os.replace(tmp_path, self._checkpoint_path)
+    
     def process_from_file(self, text_file):
         """
         Process transcribed text from a text file (one text per line)
@@ -301,6 +870,10 @@ class TranscribeProcessor:
                 self.save_to_excel(result)
             
             print("-" * 60)
+        
+        self.flush_excel()
+        self.intent_analyzer.save_cache()
+        self.llm_cache.report()
     
     def process_single(self, transcribed_text, audio_name=None):
         """
@@ -313,6 +886,7 @@ class TranscribeProcessor:
         result = self.process_text(transcribed_text, audio_name)
         if result:
             self.save_to_excel(result)
+            self.flush_excel()
         return result
     
     def process_from_excel(self, source_excel_file, limit=20, audio_col=1, transcribe_col=2):
@@ -332,28 +906,20 @@ class TranscribeProcessor:
         print(f"Reading from Excel file: {source_excel_file}")
         
         try:
-            wb = load_workbook(source_excel_file, read_only=False)
-            ws = wb.active
-            
-            total_rows = ws.max_row
-            print(f"Total rows in source file: {total_rows}")
-            
-            # Process first 'limit' rows (skip header row)
-            rows_to_process = min(limit, total_rows - 1)
+            # Process first 'limit' rows (skip header row), read as plain values
+            rows_data = read_source_rows(source_excel_file, limit, audio_col, transcribe_col)
+            rows_to_process = len(rows_data)
             print(f"Processing first {rows_to_process} transcriptions...\n")
             
             processed = 0
             skipped = 0
             
-            for row_idx in range(2, min(2 + limit, total_rows + 1)):
+            for row_idx, audio_name, transcribed_text in rows_data:
                 try:
-                    # Get audio name and transcription
-                    audio_name = ws.cell(row=row_idx, column=audio_col).value
-                    transcribed_text = ws.cell(row=row_idx, column=transcribe_col).value
-                    
                     # Skip if no transcription
                     if not transcribed_text or not str(transcribed_text).strip():
                         skipped += 1
+                        self.mark_source_row(row_idx)
                         print(f"[{row_idx-1}] Skipping row {row_idx} - No transcription")
                         continue
                     
@@ -367,11 +933,12 @@ class TranscribeProcessor:
                     result = self.process_text(transcribed_text, audio_name)
                     
                     if result:
-                        self.save_to_excel(result)
+                        self.save_to_excel(result, source_row=row_idx)
                         processed += 1
                         print(f"✓ Row {row_idx} processed and saved")
                     else:
                         skipped += 1
+                        self.mark_source_row(row_idx)
                         print(f"✗ Row {row_idx} failed to process")
                     
                     print("-" * 60)
@@ -381,8 +948,13 @@ class TranscribeProcessor:
                     import traceback
                     traceback.print_exc()
                     skipped += 1
+                    self.mark_source_row(row_idx)
                     continue
             
+            self.flush_excel()
+            self.intent_analyzer.save_cache()
+            self.llm_cache.report()
+            
             print(f"\n{'='*60}")
             print(f"Processing Complete!")
             print(f"Processed: {processed}")
@@ -410,6 +982,10 @@ class TranscribeProcessor:
             if result:
                 self.save_to_excel(result)
             print("-" * 60)
+        
+        self.flush_excel()
+        self.intent_analyzer.save_cache()
+        self.llm_cache.report()
 
 
 def main():
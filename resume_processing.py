@@ -10,19 +10,31 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from process_simple import process_excel_simple
+from check_progress import pending_rows, read_checkpoint
 
 
 def find_last_processed_row(output_file='IntentOfthetranscribetext.xlsx'):
     """Find the last row that was processed"""
-    if not os.path.exists(output_file):
+    # The processor's checkpoint answers this without opening the workbook
+    next_row = read_checkpoint(output_file)
+    if next_row is not None:
+        print(f"✓ Source rows up to {next_row - 1} finished (checkpoint)")
+        print(f"📍 Will resume from row {next_row}")
+        return next_row
+    
+    # Rows of an unfinished run are journaled beside the (not yet written) output file
+    pending = pending_rows(output_file)
+    if not os.path.exists(output_file) and not pending:
         print(f"Output file not found. Starting from beginning.")
         return 2  # Start from row 2 (after header)
     
     try:
-        wb = load_workbook(output_file, read_only=True)
-        ws = wb.active
-        last_row = ws.max_row
-        wb.close()
+        last_row = 1 + pending  # Header row
+        if os.path.exists(output_file):
+            wb = load_workbook(output_file, read_only=True)
+            ws = wb.active
+            last_row = ws.max_row + pending
+            wb.close()
         
         # Next row to process is last_row + 1
         # But we need to account for the header row
@@ -1,64 +1,281 @@
 """
-Speech-to-Text module using faster-whisper LARGE-V3
+Speech-to-Text module using faster-whisper (large-v3-turbo by default)
 ✔ Supports MIXED languages in one audio (Hindi + English + Telugu + Urdu)
 ✔ Uses Whisper auto-language detection
 ✔ 100% OFFLINE after first download
 ✔ Clean, fast, and stable
 """
 
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 import numpy as np
-import librosa
-import torch
+import soundfile as sf
+
+# torch and librosa are imported where they're used: both are slow to import
+# and librosa is only needed for formats/resampling the fast paths don't cover
+
+# torchaudio's polyphase resampler (C++) is much faster than librosa's default
+TORCHAUDIO_AVAILABLE = find_spec('torchaudio') is not None
+
+# Temperature schedule for faster-whisper: greedy/beam search at temperature 0,
+# only re-decoding at a higher temperature when the output looks degenerate
+# (capped at 0.6 so a bad segment costs at most three retries). Only
+# WhisperModel.transcribe does this fallback; BatchedInferencePipeline decodes
+# once at the first temperature, so audio that fits in one window (every live
+# utterance) goes through WhisperModel.transcribe - batching has nothing to
+# batch there - and only longer audio is batched.
+_TEMPERATURES = [0.0, 0.2, 0.4, 0.6]
+
+# Whisper's input window (30s at 16 kHz)
+_WINDOW_SAMPLES = 30 * 16000
+
+# Silero VAD (built into faster-whisper) runs on the decoded array before the
+# encoder. WhisperModel.transcribe only cuts pauses of 2s+ (padded by 400ms) by
+# default; cutting pauses of 0.5s+ with 200ms padding keeps less silence
+_VAD_PARAMETERS = dict(min_silence_duration_ms=500, speech_pad_ms=200)
+# BatchedInferencePipeline already cuts pauses of 160ms+ by default (a longer
+# minimum would merge more silence into its chunks); only the padding is trimmed
+_BATCHED_VAD_PARAMETERS = dict(min_silence_duration_ms=160, speech_pad_ms=200)
+
+# Loaded Whisper models keyed by (backend, model, device, compute_type, threads), shared by
+# all STTModule instances so the weights are only read into (V)RAM once
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+# Whisper language codes -> language names used by the rest of the agent
+WHISPER_LANGUAGES = {
+    'hi': 'hindi',
+    'en': 'english',
+    'ur': 'urdu',
+    'te': 'telugu',
+}
+
+
+def _resample(audio, sr, target_sr=16000):
+    """Resample a mono float32 array (no-op when the rate already matches)"""
+    if sr == target_sr:
+        return audio
+    if TORCHAUDIO_AVAILABLE:
+        import torch
+        import torchaudio.functional as AF
+        return AF.resample(torch.from_numpy(np.ascontiguousarray(audio)), sr, target_sr).numpy()
+    import librosa
+    return librosa.resample(audio, orig_sr=sr, target_sr=target_sr)
+
+
+def _load_audio(audio_path, target_sr=16000):
+    """Load an audio file as mono float32 at target_sr"""
+    try:
+        # libsndfile reads WAV/FLAC/OGG directly, much faster than librosa.load
+        audio, sr = sf.read(audio_path, dtype='float32', always_2d=False)
+    except Exception:
+        # Formats libsndfile can't decode (e.g. MP3/M4A on older builds)
+        import librosa
+        audio, _ = librosa.load(audio_path, sr=target_sr)
+        return audio
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    return _resample(audio, sr, target_sr)
 
 
 class STTModule:
-    def __init__(self, use_whisper=True):
+    def __init__(self, use_whisper=True, language='english', auto_detect=True, backend='faster-whisper',
+                 batch_size=None, compute_type=None, pin_language=False, beam_size=1,
+                 high_accuracy=False, model_size='large-v3-turbo', no_speech_threshold=0.5,
+                 compression_ratio_threshold=2.4, log_prob_threshold=-1.0, warmup=True):
         """
         Initialize STT Module (Multilingual Version)
 
         Args:
             use_whisper: Always True (Whisper has best multilingual accuracy)
+            language: Language used when auto-detection is disabled
+            auto_detect: Let Whisper detect the language (and update self.language)
+            backend: 'faster-whisper' (default) or 'whisper.cpp' (pywhispercpp; uses the
+                     CUDA/Metal/CoreML backend it was built with)
+            batch_size: VAD segments decoded per forward pass with faster-whisper, for
+                        audio longer than one 30s window (default: 8 on GPU, 4 on CPU)
+            compute_type: CTranslate2 compute type (default: 'int8_float16' on GPU, INT8
+                          weights with FP16 activations; 'int8' on CPU). E.g. 'float16',
+                          or 'int8_bfloat16' on Ampere+ GPUs
+            pin_language: With auto_detect, keep the first confidently detected language
+                          for later calls (skips per-call detection and keeps the decoder
+                          start tokens constant); reset with unpin_language()
+            beam_size: Decoder beam width with faster-whisper (default: 1, greedy)
+            high_accuracy: Use beam search with 5 beams (slower, slightly better WER)
+            model_size: Whisper weights (default: 'large-v3-turbo', 4 decoder layers
+                        instead of 32, several times faster). Turbo loses some accuracy on
+                        low-resource languages; use 'large-v3' if Telugu/Urdu accuracy
+                        matters more than speed, or 'distil-large-v3' for English-heavy audio
+            no_speech_threshold: Drop a segment as silence above this no-speech probability
+                                 (when its log-prob is also below log_prob_threshold)
+            compression_ratio_threshold: Re-decode (next temperature) above this gzip
+                                         ratio, i.e. when the text repeats itself
+            log_prob_threshold: Re-decode below this average token log-probability
+            (These three only apply to audio up to 30s, which faster-whisper decodes
+            sequentially; BatchedInferencePipeline, used for longer audio, decodes
+            once and ignores them.)
+            warmup: Run warmup() before returning, so the first real utterance doesn't
+                    pay for kernel loading/selection (call warmup() yourself if False)
         """
         self.use_whisper = use_whisper
+        self.language = language
+        self.auto_detect = auto_detect
+        self.backend = backend
+        self.model_size = model_size
+        self.pin_language = pin_language
+        self.beam_size = 5 if high_accuracy else beam_size
+        self.decode_options = dict(
+            temperature=_TEMPERATURES,
+            compression_ratio_threshold=compression_ratio_threshold,
+            log_prob_threshold=log_prob_threshold,
+            no_speech_threshold=no_speech_threshold,
+        )
+        self._pinned_code = None
+        import torch
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.batch_size = batch_size or (8 if self.device == "cuda" else 4)
+        self.compute_type = compute_type or ("int8_float16" if self.device == "cuda" else "int8")
+        self._batched = None  # BatchedInferencePipeline, created on first use
+        # Decodes upcoming files while the model transcribes the current one
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='stt-decode')
+        self.prefetch_depth = 4
 
-        # Load faster-whisper LARGE-V3
+        if backend == 'whisper.cpp':
+            self._load_whisper_cpp()
+        else:
+            self._load_faster_whisper()
+
+        if warmup:
+            self.warmup()
+
+    def _load_faster_whisper(self):
+        """Load the Whisper weights with faster-whisper (CTranslate2)"""
         try:
             from faster_whisper import WhisperModel
-            print("Loading faster-whisper large-v3 (best multilingual accuracy)...")
+            print(f"Loading faster-whisper {self.model_size}...")
+
+            # INT8 on CPU is only fast with its thread count set explicitly: one
+            # worker using every core (OMP_NUM_THREADS overrides the core count)
+            cpu_threads = int(os.getenv('OMP_NUM_THREADS') or os.cpu_count() or 4) if self.device == "cpu" else 0
 
-            self.model = WhisperModel(
-                "large-v3",
-                device=self.device,
-                compute_type="float16" if self.device == "cuda" else "int8",
-            )
+            key = ('faster-whisper', self.model_size, self.device, self.compute_type, cpu_threads)
+            with _MODEL_CACHE_LOCK:
+                if key not in _MODEL_CACHE:
+                    _MODEL_CACHE[key] = WhisperModel(
+                        self.model_size,
+                        device=self.device,
+                        compute_type=self.compute_type,
+                        cpu_threads=cpu_threads,
+                        num_workers=1,
+                    )
+            self.model = _MODEL_CACHE[key]
 
-            print(f"Whisper LARGE-V3 loaded successfully on {self.device.upper()}!")
+            print(f"Whisper {self.model_size} loaded successfully on {self.device.upper()}!")
 
         except ImportError:
             raise ImportError("Install faster-whisper: pip install faster-whisper")
         except Exception as e:
             raise RuntimeError(f"Failed to load faster-whisper: {e}")
 
+    def _load_whisper_cpp(self):
+        """Load the Whisper weights through the whisper.cpp bindings"""
+        try:
+            from pywhispercpp.model import Model
+            print(f"Loading whisper.cpp {self.model_size}...")
+
+            # GPU offload (CUDA / Metal / CoreML) is chosen when pywhispercpp is built,
+            # e.g. WHISPER_CUDA=1 or WHISPER_COREML=1
+            key = ('whisper.cpp', self.model_size, None, None, os.cpu_count() or 4)
+            with _MODEL_CACHE_LOCK:
+                if key not in _MODEL_CACHE:
+                    _MODEL_CACHE[key] = Model(self.model_size, n_threads=os.cpu_count() or 4, print_progress=False)
+            self.model = _MODEL_CACHE[key]
+
+            print(f"whisper.cpp {self.model_size} loaded successfully!")
+
+        except ImportError:
+            raise ImportError("Install whisper.cpp bindings: pip install pywhispercpp")
+        except Exception as e:
+            raise RuntimeError(f"Failed to load whisper.cpp: {e}")
+
+    def warmup(self):
+        """
+        Run 1s of silence through the model
+
+        The first call loads kernels, selects algorithms and allocates buffers;
+        doing it here keeps that cost off the first user utterance. VAD is off so
+        the silence actually reaches the encoder. self.language is not touched.
+        """
+        start = time.perf_counter()
+        dummy = np.zeros(16000, dtype=np.float32)
+        try:
+            if self.backend == 'whisper.cpp':
+                self.model.transcribe(dummy, language='en', translate=False)
+            else:
+                # Same entry point as a live utterance (one window, see _faster_whisper_segments)
+                segments, _ = self.model.transcribe(
+                    dummy, language='en', task="transcribe", beam_size=self.beam_size,
+                    vad_filter=False,
+                )
+                list(segments)
+        except Exception as e:
+            print(f"[WARNING] STT warmup failed: {e}")
+            return
+        print(f"[STT] Warmup done in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    @staticmethod
+    def clear_model_cache():
+        """Drop all cached Whisper models (e.g. to free GPU memory)"""
+        with _MODEL_CACHE_LOCK:
+            _MODEL_CACHE.clear()
+
+    def set_language(self, language):
+        """
+        Set the language used when auto-detection is disabled
+
+        Args:
+            language: 'hindi', 'english', 'urdu', or 'telugu'
+        """
+        self.language = language.lower()
+
+    def unpin_language(self):
+        """Forget the pinned language so the next call detects it again"""
+        self._pinned_code = None
+
+    def _language_code(self):
+        """Whisper language code for self.language (None if unknown)"""
+        codes = {name: code for code, name in WHISPER_LANGUAGES.items()}
+        return codes.get(self.language)
+
     def preprocess_audio(self, audio_path, target_sr=16000):
         """
         Load + normalize audio
         Speech recording already has noise reduction applied, so only normalization is needed
         """
-        audio, sr = librosa.load(audio_path, sr=target_sr)
+        audio = _load_audio(audio_path, target_sr)
 
-        # Normalize audio volume
-        if len(audio) > 0 and np.max(np.abs(audio)) > 0:
-            audio = audio / np.max(np.abs(audio))
+        # Normalize audio volume in place; the peak comes from max/min reductions,
+        # so no |audio| temporary is allocated
+        if len(audio) > 0:
+            peak = max(float(audio.max()), -float(audio.min()))
+            if peak > 0:
+                np.multiply(audio, np.float32(1.0 / peak), out=audio)
 
         return audio
 
-    def transcribe(self, audio_path):
+    def transcribe(self, audio_path, on_partial=None):
         """
         Transcribe audio using multilingual Whisper (mixed language capable)
 
         Args:
             audio_path: path to WAV/MP3/M4A file
+            on_partial: optional callback called with each segment's text as soon
+                        as it is decoded (e.g. for live display)
 
         Returns:
             full_text: Transcribed text (may contain Hindi + English + Telugu)
@@ -66,27 +283,227 @@ class STTModule:
 
         print("Transcribing with multi-language Whisper...")
 
-        try:
-            # DO NOT set language → Whisper auto-detects (supports mixed speech!)
-            segments, info = self.model.transcribe(
-                audio_path,
-                language=None,            # <– enables multi-language detection
-                task="transcribe",        # <– transcription, NOT translation
-                beam_size=5,
-                vad_filter=True,
-            )
-
-            # Merge all segments into final text
-            full_text = " ".join([seg.text for seg in segments])
-            full_text = full_text.strip()
-
-            if full_text == "":
-                print("[STT] No speech detected.")
-                return ""
-
-            print("[STT] Transcription complete.")
-            return full_text
+        # Decode once here; the backends then get the 16 kHz array instead of
+        # decoding and resampling the file again
+        return self._run_whisper(self.preprocess_audio(audio_path), on_partial=on_partial)
+
+    def stream(self, audio_path):
+        """
+        Transcribe a file segment by segment
+
+        Args:
+            audio_path: path to WAV/MP3/M4A file
+
+        Yields:
+            Text of each segment, as soon as it is decoded
+        """
+        yield from self._segment_texts(self.preprocess_audio(audio_path))
+
+    def transcribe_array(self, audio, sr=16000):
+        """
+        Transcribe an in-memory audio array
+
+        Args:
+            audio: mono float32 numpy array in [-1, 1]
+            sr: sample rate of `audio` (Whisper expects 16000)
 
+        Returns:
+            full_text: Transcribed text
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        if sr != 16000:
+            audio = _resample(audio, sr, 16000)
+        return self._run_whisper(audio)
+
+    def _batched_pipeline(self):
+        """BatchedInferencePipeline around the loaded model (created once)"""
+        if self._batched is None:
+            from faster_whisper import BatchedInferencePipeline
+            self._batched = BatchedInferencePipeline(model=self.model)
+        return self._batched
+
+    def prefetch(self, audio_path):
+        """
+        Start decoding a file in the background
+
+        Args:
+            audio_path: path to an audio file
+
+        Returns:
+            Future resolving to the preprocessed 16 kHz array; pass its result()
+            to transcribe_array()
+        """
+        return self._pool.submit(self.preprocess_audio, audio_path)
+
+    def _decoded(self, paths):
+        """Yield decoded 16 kHz arrays for paths, decoding up to prefetch_depth files ahead"""
+        paths = iter(paths)
+        pending = deque()
+        for path in paths:
+            pending.append(self._pool.submit(_load_audio, path))
+            if len(pending) >= self.prefetch_depth:
+                break
+        while pending:
+            audio = pending.popleft().result()
+            path = next(paths, None)
+            if path is not None:
+                pending.append(self._pool.submit(_load_audio, path))
+            yield audio
+
+    def transcribe_batch(self, paths, batch_size=None):
+        """
+        Transcribe many audio files
+
+        Files are decoded on background threads a few files ahead, so decoding
+        overlaps with transcription. With faster-whisper, each file then goes
+        through BatchedInferencePipeline, which runs its 30s windows through the
+        encoder in batches of `batch_size` instead of one window at a time
+        (files that fit in one window are decoded with temperature fallback instead).
+
+        Args:
+            paths: list of audio file paths
+            batch_size: number of 30s windows per encoder batch (default: self.batch_size)
+
+        Returns:
+            List of transcribed texts, in the same order as `paths`
+        """
+        if self.backend == 'whisper.cpp':
+            return [self._run_whisper(audio) for audio in self._decoded(paths)]
+
+        texts = []
+        for audio in self._decoded(paths):
+            try:
+                segments, info = self._faster_whisper_segments(
+                    audio, None if self.auto_detect else self._language_code(), batch_size)
+                texts.append(" ".join([seg.text for seg in segments]).strip())
+            except Exception as e:
+                raise RuntimeError(f"Whisper transcription error: {e}")
+
+        print(f"[STT] Batch transcription complete ({len(texts)} files).")
+        return texts
+
+    def transcribe_stream(self, chunk_iter, sr=16000, silence_threshold=0.015, max_segment_seconds=30,
+                          preprocess=None):
+        """
+        Transcribe audio while it is still being recorded
+
+        Speech chunks are buffered until the speaker pauses (a silent chunk) and the
+        buffered phrase is transcribed right away, so only the last phrase is left
+        to transcribe when recording stops.
+
+        Args:
+            chunk_iter: iterable of mono float32 numpy arrays (e.g. VoiceRecorder.stream_chunks())
+            sr: sample rate of the chunks
+            silence_threshold: peak amplitude below which a chunk counts as silence
+            max_segment_seconds: commit the buffer once it reaches this length (Whisper window is 30s)
+            preprocess: optional callable (audio, sr) -> audio applied to each phrase before
+                        transcription, e.g. NoiseReducer.reduce_noise_array
+
+        Yields:
+            Committed text for each phrase, in order
+        """
+        pending = []
+        pending_samples = 0
+        max_samples = int(sr * max_segment_seconds)
+
+        for chunk in chunk_iter:
+            is_silent = len(chunk) == 0 or np.max(np.abs(chunk)) < silence_threshold
+
+            if not is_silent:
+                pending.append(chunk)
+                pending_samples += len(chunk)
+
+            # Commit on a pause, or when the buffer fills Whisper's window
+            if pending and (is_silent or pending_samples >= max_samples):
+                text = self._transcribe_phrase(np.concatenate(pending), sr, preprocess)
+                pending = []
+                pending_samples = 0
+                if text:
+                    yield text
+
+        if pending:
+            text = self._transcribe_phrase(np.concatenate(pending), sr, preprocess)
+            if text:
+                yield text
+
+    def _transcribe_phrase(self, audio, sr, preprocess=None):
+        """Transcribe one buffered phrase of transcribe_stream"""
+        if preprocess is not None:
+            audio = preprocess(audio, sr)
+        return self.transcribe_array(audio, sr=sr)
+
+    def _segment_texts(self, audio):
+        """Yield segment texts for a 16 kHz mono float32 array as the backend produces them"""
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+
+        # Auto-detect: DO NOT set language → Whisper detects it (supports mixed speech!)
+        language = None if self.auto_detect else self._language_code()
+        if self.auto_detect and self._pinned_code:
+            language = self._pinned_code
+
+        if self.backend == 'whisper.cpp':
+            # whisper.cpp returns all segments at once (arrays are passed straight
+            # through, no WAV round-trip)
+            for seg in self.model.transcribe(audio, language=language or 'auto', translate=False):
+                yield seg.text
+            return
+
+        segments, info = self._faster_whisper_segments(audio, language)
+
+        # Track the detected language so the agent can follow it
+        if self.auto_detect and info.language in WHISPER_LANGUAGES:
+            self.language = WHISPER_LANGUAGES[info.language]
+            if self.pin_language and language is None and info.language_probability >= 0.8:
+                self._pinned_code = info.language
+
+        # Segments are a lazy generator: each one is decoded when it is consumed
+        for seg in segments:
+            yield seg.text
+
+    def _faster_whisper_segments(self, audio, language, batch_size=None):
+        """
+        Start a faster-whisper transcription of a 16 kHz array
+
+        Audio that fits in one 30s window goes through WhisperModel.transcribe,
+        which re-decodes degenerate segments at the next temperature; longer audio
+        goes through BatchedInferencePipeline, whose VAD chunks are decoded
+        batch_size at a time (once, at temperature 0).
+
+        Returns:
+            (lazy segment generator, TranscriptionInfo)
+        """
+        options = dict(
+            language=language,        # <– None enables multi-language detection
+            task="transcribe",        # <– transcription, NOT translation
+            beam_size=self.beam_size, # <– 1 = greedy decoding, much faster than beam 5
+            vad_filter=True,
+            **self.decode_options,
+        )
+        if len(audio) <= _WINDOW_SAMPLES:
+            # Segments don't see the previous segment's text, so a hallucination
+            # loop can't carry over (the batched pipeline never conditions either)
+            return self.model.transcribe(audio, condition_on_previous_text=False,
+                                         vad_parameters=_VAD_PARAMETERS, **options)
+        return self._batched_pipeline().transcribe(audio, batch_size=batch_size or self.batch_size,
+                                                   vad_parameters=_BATCHED_VAD_PARAMETERS, **options)
+
+    def _run_whisper(self, audio, on_partial=None):
+        """Run Whisper on a 16 kHz mono float32 array and join the segments"""
+        buf = io.StringIO()
+        try:
+            for text in self._segment_texts(audio):
+                buf.write(text)
+                buf.write(" ")
+                if on_partial is not None:
+                    on_partial(text)
         except Exception as e:
             raise RuntimeError(f"Whisper transcription error: {e}")
 
+        full_text = buf.getvalue().strip()
+
+        if full_text == "":
+            print("[STT] No speech detected.")
+            return ""
+
+        print("[STT] Transcription complete.")
+        return full_text
@@ -4,9 +4,23 @@ Voice recording module for capturing audio input with RNNoise/WebRTC noise reduc
 import pyaudio
 import wave
 import os
+import queue
+import threading
+import numpy as np
 from noise_reduction import NoiseReducer
 
 
+def _peak_amplitude(data):
+    """
+    Peak absolute amplitude of raw int16 PCM
+    
+    Two NumPy reductions over a zero-copy view replace struct.unpack + max().
+    max/min are taken separately since np.abs overflows on -32768.
+    """
+    pcm = np.frombuffer(data, dtype=np.int16)
+    return max(int(pcm.max()), -int(pcm.min())) if len(pcm) else 0
+
+
 class VoiceRecorder:
     def __init__(self, sample_rate=16000, channels=1, chunk=1024, format=pyaudio.paInt16):
         """
@@ -23,6 +37,10 @@ class VoiceRecorder:
         self.chunk = chunk
         self.format = format
         self.audio = pyaudio.PyAudio()
+        # Microphone stream kept open across recordings (see _open_input_stream)
+        self._stream = None
+        self._stream_params = None
+        self._buffers = queue.Queue()
         
         # Initialize noise reducer (RNNoise/WebRTC)
         self.noise_reducer = NoiseReducer()
@@ -41,41 +59,32 @@ class VoiceRecorder:
         print(f"Recording for {duration} seconds... Speak now!")
         
         # Open audio stream
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
-        
-        frames = []
+        stream, buffers = self._open_input_stream()
         
-        # Record audio
-        for _ in range(0, int(self.sample_rate / self.chunk * duration)):
-            data = stream.read(self.chunk)
-            frames.append(data)
+        # Chunks go straight into the WAV file instead of a list joined at the end;
+        # one bytearray copy lets noise reduction skip reading the file back
+        pcm = bytearray()
+        wf = self._open_wav(output_path)
+        try:
+            # Record audio
+            for _ in range(0, int(self.sample_rate / self.chunk * duration)):
+                data = buffers.get()
+                wf.writeframesraw(data)
+                pcm += data
+        finally:
+            wf.close()
         
         print("Recording finished!")
         
-        # Stop and close stream
+        # Stop stream (kept open for the next recording)
         stream.stop_stream()
-        stream.close()
-        
-        # Save audio file
-        wf = wave.open(output_path, 'wb')
-        wf.setnchannels(self.channels)
-        wf.setsampwidth(self.audio.get_sample_size(self.format))
-        wf.setframerate(self.sample_rate)
-        wf.writeframes(b''.join(frames))
-        wf.close()
         
         # Apply noise reduction using RNNoise/WebRTC
-        output_path = self.noise_reducer.reduce_noise(output_path)
+        output_path = self.noise_reducer.reduce_noise(output_path, audio=self._pcm_samples(pcm))
         
         return output_path
     
-    def record_until_silence(self, silence_threshold=500, silence_duration=5, output_path="input.wav"):
+    def record_until_silence(self, silence_threshold=500, silence_duration=5, output_path="input.wav", return_audio=False):
         """
         Record audio until silence is detected
         
@@ -83,62 +92,242 @@ class VoiceRecorder:
             silence_threshold: Threshold for silence detection
             silence_duration: Duration of silence before stopping (seconds)
             output_path: Path to save recorded audio
+            return_audio: Also return the raw (pre noise reduction) recording as a float32 array, so STT
+                          doesn't have to read the WAV back from disk
         
         Returns:
-            Path to saved audio file
+            Path to saved audio file, or (path, float32 array) if return_audio is True
         """
-        import struct
-        
         print(f"Recording... Speak now. Recording will stop after {silence_duration} seconds of silence.")
         
-        stream = self.audio.open(
-            format=self.format,
-            channels=self.channels,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk
-        )
+        stream, buffers = self._open_input_stream()
         
-        frames = []
         silent_chunks = 0
         silent_chunks_threshold = int(self.sample_rate / self.chunk * silence_duration)
+        # Chunks go straight into the WAV file; the bytearray copy feeds noise
+        # reduction (no read-back) and the optional returned array
+        pcm = bytearray()
         
-        while True:
-            data = stream.read(self.chunk)
-            frames.append(data)
-            
-            # Check for silence
-            audio_data = struct.unpack(f"{self.chunk * self.channels}h", data)
-            max_amplitude = max(audio_data)
-            
-            if max_amplitude < silence_threshold:
-                silent_chunks += 1
-                if silent_chunks > silent_chunks_threshold:
-                    break
-            else:
-                silent_chunks = 0
+        wf = self._open_wav(output_path)
+        try:
+            while True:
+                data = buffers.get()
+                wf.writeframesraw(data)
+                pcm += data
+                
+                # Check for silence
+                if _peak_amplitude(data) < silence_threshold:
+                    silent_chunks += 1
+                    if silent_chunks > silent_chunks_threshold:
+                        break
+                else:
+                    silent_chunks = 0
+        finally:
+            wf.close()
         
         print("Recording finished!")
         
         stream.stop_stream()
-        stream.close()
         
-        # Save audio file
+        # Apply noise reduction using RNNoise/WebRTC
+        output_path = self.noise_reducer.reduce_noise(output_path, audio=self._pcm_samples(pcm))
+        
+        if return_audio:
+            return output_path, self._pcm_to_array(pcm)
+        return output_path
+    
+    def stream_chunks(self, chunk_seconds=1.0, silence_threshold=500, silence_duration=5, output_path=None):
+        """
+        Record audio and yield it in fixed-size chunks while recording continues
+        
+        A background thread reads the microphone into a queue, so the consumer
+        (e.g. streaming STT) can process earlier chunks while the speaker is still talking.
+        Recording stops after `silence_duration` seconds of silence.
+        
+        Args:
+            chunk_seconds: Length of each yielded chunk in seconds (default: 1.0)
+            silence_threshold: Amplitude threshold for silence detection
+            silence_duration: Duration of silence before stopping (seconds)
+            output_path: Optional path to also save the full recording as WAV
+        
+        Yields:
+            numpy float32 arrays in [-1, 1] at self.sample_rate (mono); read-only views
+            into the recording buffer, valid after the generator finishes
+        
+        Closing the generator early (e.g. the consumer raised) stops the recording
+        right away instead of waiting for the silence timeout.
+        """
+        print(f"Recording... Speak now. Recording will stop after {silence_duration} seconds of silence.")
+        
+        stream, buffers = self._open_input_stream()
+        
+        chunk_queue = queue.Queue()
+        stop = threading.Event()
+        reads_per_chunk = max(1, int(self.sample_rate / self.chunk * chunk_seconds))
+        silent_chunks_threshold = int(self.sample_rate / self.chunk * silence_duration)
+        
+        # Samples are converted once into a preallocated float32 buffer (60s, grown by
+        # doubling) and chunks are handed out as views into it instead of copies
+        buf = {'audio': np.empty(self.sample_rate * 60, dtype=np.float32), 'len': 0}
+        
+        def _append(data):
+            pcm = np.frombuffer(data, dtype=np.int16)
+            if self.channels > 1:
+                pcm = pcm.reshape(-1, self.channels).mean(axis=1)
+            start = buf['len']
+            end = start + len(pcm)
+            if end > len(buf['audio']):
+                # Views already handed out keep referencing the old array
+                grown = np.empty(max(end, 2 * len(buf['audio'])), dtype=np.float32)
+                grown[:start] = buf['audio'][:start]
+                buf['audio'] = grown
+            np.multiply(pcm, 1.0 / 32768.0, out=buf['audio'][start:end], casting='unsafe')
+            buf['len'] = end
+        
+        def _capture():
+            block_start = 0
+            reads = 0
+            silent_chunks = 0
+            try:
+                while not stop.is_set():
+                    try:
+                        data = buffers.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    _append(data)
+                    reads += 1
+                    
+                    # Check for silence
+                    if _peak_amplitude(data) < silence_threshold:
+                        silent_chunks += 1
+                    else:
+                        silent_chunks = 0
+                    
+                    if reads >= reads_per_chunk:
+                        chunk_queue.put(buf['audio'][block_start:buf['len']])
+                        block_start = buf['len']
+                        reads = 0
+                    
+                    if silent_chunks > silent_chunks_threshold:
+                        break
+                
+                if reads:
+                    chunk_queue.put(buf['audio'][block_start:buf['len']])
+            finally:
+                chunk_queue.put(None)
+        
+        capture_thread = threading.Thread(target=_capture, daemon=True)
+        capture_thread.start()
+        
+        try:
+            while True:
+                chunk = chunk_queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Also reached when the consumer stops early: end the capture loop
+            # and the microphone before waiting for the thread
+            stop.set()
+            stream.stop_stream()
+            capture_thread.join()
+            print("Recording finished!")
+            
+            # Save audio file off the critical path (STT already has the audio in memory);
+            # non-daemon so the write still finishes if the program exits
+            if output_path:
+                pcm16 = (buf['audio'][:buf['len']] * 32768.0).astype(np.int16)
+                threading.Thread(target=self._write_wav, args=(output_path, [pcm16.tobytes()]),
+                                 kwargs={'channels': 1}).start()
+    
+    def _open_input_stream(self):
+        """
+        Start the microphone in PyAudio callback mode
+        
+        PortAudio's own thread pushes each buffer onto a queue, so capture keeps
+        running while Python is busy with silence checks or file writes instead of
+        overrunning between blocking read() calls.
+        
+        The stream is opened once and only started here; callers stop_stream() when
+        done and cleanup() closes it. Opening a PortAudio stream enumerates devices
+        and sets up the OS audio graph (100+ ms on WASAPI), which successive
+        recordings now skip. It is re-opened if the recorder's format changes.
+        
+        Returns:
+            (stream, queue of raw int16 buffers of self.chunk frames)
+        """
+        params = (self.format, self.channels, self.sample_rate, self.chunk)
+        if self._stream is not None and self._stream_params != params:
+            self._stream.close()
+            self._stream = None
+        
+        if self._stream is None:
+            buffers = self._buffers
+            
+            def _callback(in_data, frame_count, time_info, status):
+                buffers.put(in_data)
+                return (None, pyaudio.paContinue)
+            
+            self._stream = self.audio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.sample_rate,
+                input=True,
+                frames_per_buffer=self.chunk,
+                stream_callback=_callback,
+                start=False
+            )
+            self._stream_params = params
+        elif not self._stream.is_stopped():
+            self._stream.stop_stream()
+        
+        # Drop buffers the callback queued after the previous recording stopped reading
+        while True:
+            try:
+                self._buffers.get_nowait()
+            except queue.Empty:
+                break
+        
+        self._stream.start_stream()
+        return self._stream, self._buffers
+    
+    def _open_wav(self, output_path, channels=None):
+        """
+        Open a WAV file for writing with this recorder's format
+        
+        Write chunks with writeframesraw(); the header sizes are fixed up on close().
+        """
         wf = wave.open(output_path, 'wb')
-        wf.setnchannels(self.channels)
+        wf.setnchannels(channels or self.channels)
         wf.setsampwidth(self.audio.get_sample_size(self.format))
         wf.setframerate(self.sample_rate)
+        return wf
+    
+    def _write_wav(self, output_path, frames, channels=None):
+        """Write raw int16 frames to a WAV file"""
+        wf = self._open_wav(output_path, channels)
         wf.writeframes(b''.join(frames))
         wf.close()
-        
-        # Apply noise reduction using RNNoise/WebRTC
-        output_path = self.noise_reducer.reduce_noise(output_path)
-        
-        return output_path
     
+    def _pcm_samples(self, data):
+        """Raw int16 PCM bytes as an (int16 samples, sample rate) pair for NoiseReducer"""
+        pcm = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            pcm = pcm.reshape(-1, self.channels)
+        return pcm, self.sample_rate
+    
+    def _pcm_to_array(self, data):
+        """Convert raw int16 PCM bytes to a mono float32 array in [-1, 1]"""
+        pcm = np.frombuffer(data, dtype=np.int16)
+        if self.channels > 1:
+            pcm = pcm.reshape(-1, self.channels).mean(axis=1)
+        return pcm.astype(np.float32) / 32768.0
     
     def cleanup(self):
         """Clean up audio resources"""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
         self.audio.terminate()
 
 